@@ -1,10 +1,15 @@
+import asyncio
 import discord
 from discord.ext import commands
 import json
 import os
+import signal
 import sys
 from dotenv import load_dotenv
 from modules.logger import Logger
+from modules.db import ensure_indexes, audit_queries
+from modules.command_sync import sync_commands
+from modules.startup_profiler import StartupProfiler
 from rich.progress import Progress
 
 log = Logger("BOT")
@@ -40,6 +45,7 @@ intents.voice_states = True
 intents.message_content = True
 
 bot = commands.Bot(command_prefix=config.get("prefix", "!"), intents=intents)
+shutdown_task = None
 
 @bot.event
 async def on_ready():
@@ -50,6 +56,7 @@ async def setup_hook():
     success = 0
     errors = 0
     extensions = []
+    profiler = StartupProfiler()
     
     log.info(f"Scanning for extensions in: {CURRENT_DIR}")
 
@@ -74,23 +81,52 @@ async def setup_hook():
     else:
         log.warning(f"Commands folder not found at: {commands_path}")
     
-    # Завантаження
+    # Завантаження (з заміром часу імпортів і setup кожного розширення)
+    profiler.install()
     with Progress() as progress:
         task = progress.add_task("[green]Loading extensions...", total=len(extensions))
         
         for ext_type, ext_path, ext_name in extensions:
             try:
-                await bot.load_extension(ext_path)
+                with profiler.extension(ext_name):
+                    await bot.load_extension(ext_path)
                 log.info(f"Loaded {ext_type}: {ext_name}")
                 success += 1
             except Exception as e:
                 log.error(f"Failed to load {ext_type} {ext_name}: {e}")
                 errors += 1
             progress.update(task, advance=1)
+    profiler.uninstall()
     
     log.info(f"Extensions loaded: {success} success, {errors} errors")
+
+    # Індекси, які оголосили завантажені коги
+    try:
+        await ensure_indexes()
+        if os.getenv("MONGO_AUDIT"):
+            await audit_queries()
+    except Exception as e:
+        log.error(f"Failed to prepare database indexes: {e}")
     
-    await bot.tree.sync()
-    log.info("Synced slash commands globally")
+    # Sync тільки коли дерево команд змінилося (SYNC_COMMANDS=guild - миттєво на тестовий сервер)
+    try:
+        await sync_commands(bot, guild_id=config.get("guild"))
+    except discord.HTTPException as e:
+        log.error(f"Failed to sync commands: {e}")
+
+    # SIGTERM (docker stop, systemd) - штатне закриття: cog_unload скидає буфери XP і голосових сесій
+    def on_sigterm():
+        # Посилання на задачу, щоб збирач сміття не знищив її посеред закриття
+        global shutdown_task
+        if shutdown_task is None:
+            shutdown_task = asyncio.create_task(bot.close())
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, on_sigterm)
+    except NotImplementedError:
+        # Windows: обробники сигналів у циклі подій не підтримуються
+        pass
+
+    profiler.report()
 
 bot.run(TOKEN)
\ No newline at end of file
@@ -3,9 +3,7 @@ from discord import app_commands
 from discord.ext import commands
 import json
 import datetime
-from modules.db import get_database
-
-db = get_database()
+from modules.db import users
 
 def is_admin_or_dev(user_id):
     try:
@@ -18,28 +16,6 @@ def is_admin_or_dev(user_id):
 def check_permissions(interaction):
     return interaction.user.guild_permissions.administrator or is_admin_or_dev(interaction.user.id)
 
-async def get_user_data(guild_id, user_id):
-    user = await db.users.find_one({"guild_id": guild_id, "user_id": user_id})
-    if not user:
-        user = {
-            "guild_id": guild_id,
-            "user_id": user_id,
-            "xp": 0,
-            "level": 1,
-            "messages": 0,
-            "voice_minutes": 0,
-            "reactions": 0,
-            "history": {}
-        }
-        await db.users.insert_one(user)
-    return user
-
-async def update_user_data(guild_id, user_id, update_data):
-    await db.users.update_one(
-        {"guild_id": guild_id, "user_id": user_id},
-        {"$set": update_data}
-    )
-
 class AdminCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -63,32 +39,29 @@ class AdminCommands(commands.Cog):
             await interaction.response.send_message("❌ Недостатньо прав.", ephemeral=True)
             return
 
-        user_data = await get_user_data(interaction.guild.id, користувач.id)
-
         if дія.value == "add":
             if кількість <= 0:
                 await interaction.response.send_message("❌ Кількість XP має бути більше 0.", ephemeral=True)
                 return
-            await update_user_data(interaction.guild.id, користувач.id, {"xp": user_data["xp"] + кількість})
+            await users.add_activity(interaction.guild.id, користувач.id, xp=кількість)
             await interaction.response.send_message(f"✅ {кількість} XP додано {користувач.mention}.", ephemeral=True)
 
         elif дія.value == "remove":
             if кількість <= 0:
                 await interaction.response.send_message("❌ Кількість XP має бути більше 0.", ephemeral=True)
                 return
-            new_xp = max(user_data["xp"] - кількість, 0)
-            await update_user_data(interaction.guild.id, користувач.id, {"xp": new_xp})
+            await users.add_activity(interaction.guild.id, користувач.id, xp=-кількість)
             await interaction.response.send_message(f"🗑️ {кількість} XP забрано у {користувач.mention}.", ephemeral=True)
 
         elif дія.value == "setlevel":
             if кількість <= 0:
                 await interaction.response.send_message("❌ Рівень має бути більше 0.", ephemeral=True)
                 return
-            await update_user_data(interaction.guild.id, користувач.id, {"level": кількість})
+            await users.set_fields(interaction.guild.id, користувач.id, {"level": кількість})
             await interaction.response.send_message(f"🔧 Рівень {користувач.mention} встановлено на {кількість}.", ephemeral=True)
 
         elif дія.value == "reset":
-            await update_user_data(interaction.guild.id, користувач.id, {"xp": 0})
+            await users.set_fields(interaction.guild.id, користувач.id, {"xp": 0})
             await interaction.response.send_message(f"🔄 XP {користувач.mention} скинуто до 0.", ephemeral=True)
 
     @app_commands.command(name="purge", description="Очистити чат")
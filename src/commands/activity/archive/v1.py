@@ -1,10 +1,9 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from modules.db import get_database
+from modules.db import users as users_repo
 import math
 
-db = get_database()
 
 class LeaderboardView(discord.ui.View):
     def __init__(self, users, guild, current_user, page=0):
@@ -119,7 +118,7 @@ class LeaderboardView(discord.ui.View):
     
     @discord.ui.button(emoji="🔄", style=discord.ButtonStyle.success)
     async def refresh(self, interaction: discord.Interaction, button: discord.ui.Button):
-        users = await db.users.find({"guild_id": interaction.guild.id}).to_list(None)
+        users = await users_repo.list_guild(interaction.guild.id)
         self.users = sorted(users, key=lambda x: x["xp"] + x["level"] * 1000, reverse=True)
         self.max_pages = math.ceil(len(self.users) / self.per_page)
         if self.page >= self.max_pages:
@@ -135,7 +134,7 @@ class LeaderboardCommands(commands.Cog):
     async def leaderboard(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
         
-        users = await db.users.find({"guild_id": interaction.guild.id}).to_list(None)
+        users = await users_repo.list_guild(interaction.guild.id)
         
         if not users:
             embed = discord.Embed(
@@ -1,33 +1,118 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from modules.db import get_database
+from modules.db import users as users_repo
+from modules.ranking import ranking
+from modules.xp import get_score
+import asyncio
 import math
 
-db = get_database()
+
+PAGE_FIELDS = {"user_id": 1, "xp": 1, "level": 1, "voice_minutes": 1, "reactions": 1, "score": 1}
+
+class LeaderboardPages:
+    """Сторінки лідерборду: з рейтингу в пам'яті або keyset-запитами по (score, user_id).
+    У буфері тримаються лише сусідні сторінки, наступна підвантажується заздалегідь."""
+
+    def __init__(self, guild_id, per_page):
+        self.guild_id = guild_id
+        self.per_page = per_page
+        self.total = 0
+        self._buffer = {}  # page -> asyncio.Task зі списком документів
+
+    @property
+    def ranking(self):
+        return ranking.get(self.guild_id)
+
+    async def refresh(self):
+        self._buffer.clear()
+        if self.ranking is not None:
+            self.total = len(self.ranking)
+        else:
+            self.total = await users_repo.count(self.guild_id)
+
+    @property
+    def max_pages(self):
+        return max(1, math.ceil(self.total / self.per_page))
+
+    @staticmethod
+    def _bound(data):
+        return data.get("score", 0), data["user_id"]
+
+    async def _fetch(self, page):
+        if page == 0:
+            return await users_repo.page(self.guild_id, self.per_page, PAGE_FIELDS)
+        if page == self.max_pages - 1:
+            remainder = self.total - page * self.per_page
+            return await users_repo.page(self.guild_id, remainder, PAGE_FIELDS, from_end=True)
+
+        # Межа береться з сусідньої сторінки в буфері
+        previous = self._buffer.get(page - 1)
+        if previous is not None:
+            rows = await previous
+            if rows:
+                return await users_repo.page(self.guild_id, self.per_page, PAGE_FIELDS, after=self._bound(rows[-1]))
+        following = self._buffer.get(page + 1)
+        if following is not None:
+            rows = await following
+            if rows:
+                return await users_repo.page(self.guild_id, self.per_page, PAGE_FIELDS, before=self._bound(rows[0]))
+        return await users_repo.page(self.guild_id, self.per_page, PAGE_FIELDS, skip=page * self.per_page)
+
+    def _schedule(self, page):
+        if 0 <= page < self.max_pages and page not in self._buffer:
+            self._buffer[page] = asyncio.ensure_future(self._fetch(page))
+
+    async def get(self, page):
+        """[(позиція, дані)] для сторінки"""
+        start = page * self.per_page
+        if self.ranking is not None:
+            return [
+                (position, {"user_id": user_id, **entry})
+                for position, user_id, entry in self.ranking.top(self.per_page, start)
+            ]
+
+        self._schedule(page)
+        rows = await self._buffer[page]
+        # Тримаємо тільки поточну, попередню і наступну сторінки
+        for cached in [p for p in self._buffer if abs(p - page) > 1]:
+            self._buffer.pop(cached).cancel()
+        self._schedule(page + 1)
+        return list(enumerate(rows, start=start + 1))
+
+    async def position(self, user_id):
+        """(позиція, дані) користувача або (None, None)"""
+        if self.ranking is not None:
+            return self.ranking.position(user_id), self.ranking.get(user_id)
+        user_data = await users_repo.get(self.guild_id, user_id)
+        if "_id" not in user_data:
+            return None, None
+        return await users_repo.rank(self.guild_id, get_score(user_data)), user_data
 
 class LeaderboardView(discord.ui.View):
-    def __init__(self, users, guild, current_user, page=0):
+    def __init__(self, guild, current_user, pages, page=0):
         super().__init__(timeout=300)
-        self.users = users
         self.guild = guild
         self.current_user = current_user
+        self.pages = pages
         self.page = page
-        self.per_page = 10
-        self.max_pages = math.ceil(len(users) / self.per_page)
-        
+        self.per_page = pages.per_page
         self.update_buttons()
-    
+
+    @property
+    def max_pages(self):
+        return self.pages.max_pages
+
     def update_buttons(self):
+        if self.page >= self.max_pages:
+            self.page = self.max_pages - 1
         self.first_page.disabled = self.page == 0
         self.prev_page.disabled = self.page == 0
         self.next_page.disabled = self.page >= self.max_pages - 1
         self.last_page.disabled = self.page >= self.max_pages - 1
     
-    def get_embed(self):
-        start = self.page * self.per_page
-        end = start + self.per_page
-        page_users = self.users[start:end]
+    async def get_embed(self):
+        page_users = await self.pages.get(self.page)
         
         embed = discord.Embed(
             title="ЛІДЕРБОРД СЕРВЕРА",
@@ -41,8 +126,7 @@ class LeaderboardView(discord.ui.View):
         
         medals = ["🥇", "🥈", "🥉"]
         
-        for i, data in enumerate(page_users):
-            position = start + i + 1
+        for position, data in page_users:
             member = self.guild.get_member(data["user_id"])
             name = member.display_name if member else f"Користувач#{data['user_id']}"
             
@@ -63,11 +147,15 @@ class LeaderboardView(discord.ui.View):
                 user_data = data
         
         if not user_position:
-            for i, data in enumerate(self.users):
-                if data["user_id"] == self.current_user.id:
-                    user_position = i + 1
-                    user_data = data
-                    break
+            user_position, user_data = await self.pages.position(self.current_user.id)
+            if user_position and self.pages.ranking is not None:
+                # Сусіди по рейтингу
+                neighbors = []
+                for position, user_id, entry in self.pages.ranking.around(self.current_user.id, 1):
+                    member = self.guild.get_member(user_id)
+                    name = member.display_name if member else f"Користувач#{user_id}"
+                    neighbors.append(f"`{position:2d}.` {name} • `{entry['xp']} XP`")
+                embed.add_field(name="Поруч з тобою", value="\n".join(neighbors), inline=False)
         
         embed.description = leaderboard_text or "Немає даних для відображення"
         
@@ -85,7 +173,7 @@ class LeaderboardView(discord.ui.View):
         
         embed.add_field(
             name="Всього учасників",
-            value=f"{len(self.users)}",
+            value=f"{self.pages.total}",
             inline=True
         )
         
@@ -97,35 +185,31 @@ class LeaderboardView(discord.ui.View):
     async def first_page(self, interaction: discord.Interaction, button: discord.ui.Button):
         self.page = 0
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await interaction.response.edit_message(embed=await self.get_embed(), view=self)
     
     @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.primary)
     async def prev_page(self, interaction: discord.Interaction, button: discord.ui.Button):
         self.page -= 1
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await interaction.response.edit_message(embed=await self.get_embed(), view=self)
     
     @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.primary)
     async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
         self.page += 1
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await interaction.response.edit_message(embed=await self.get_embed(), view=self)
     
     @discord.ui.button(emoji="⏩", style=discord.ButtonStyle.secondary)
     async def last_page(self, interaction: discord.Interaction, button: discord.ui.Button):
         self.page = self.max_pages - 1
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await interaction.response.edit_message(embed=await self.get_embed(), view=self)
     
     @discord.ui.button(emoji="🔄", style=discord.ButtonStyle.success)
     async def refresh(self, interaction: discord.Interaction, button: discord.ui.Button):
-        users = await db.users.find({"guild_id": interaction.guild.id}).to_list(None)
-        self.users = sorted(users, key=lambda x: x["xp"] + x["level"] * 1000, reverse=True)
-        self.max_pages = math.ceil(len(self.users) / self.per_page)
-        if self.page >= self.max_pages:
-            self.page = max(0, self.max_pages - 1)
+        await self.pages.refresh()
         self.update_buttons()
-        await interaction.response.edit_message(embed=self.get_embed(), view=self)
+        await interaction.response.edit_message(embed=await self.get_embed(), view=self)
 
 class LeaderboardCommands(commands.Cog):
     def __init__(self, bot):
@@ -135,9 +219,10 @@ class LeaderboardCommands(commands.Cog):
     async def leaderboard(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=False)
         
-        users = await db.users.find({"guild_id": interaction.guild.id}).to_list(None)
+        pages = LeaderboardPages(interaction.guild.id, 10)
+        await pages.refresh()
         
-        if not users:
+        if not pages.total:
             embed = discord.Embed(
                 title="ЛІДЕРБОРД СЕРВЕРА",
                 description="Поки що немає активних користувачів на сервері.",
@@ -146,10 +231,8 @@ class LeaderboardCommands(commands.Cog):
             await interaction.followup.send(embed=embed)
             return
         
-        sorted_users = sorted(users, key=lambda x: x["xp"] + x["level"] * 1000, reverse=True)
-        
-        view = LeaderboardView(sorted_users, interaction.guild, interaction.user)
-        embed = view.get_embed()
+        view = LeaderboardView(interaction.guild, interaction.user, pages)
+        embed = await view.get_embed()
         
         await interaction.followup.send(embed=embed, view=view)
 
@@ -1,9 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-from modules.db import get_database
-
-db = get_database()
 
 class ComplaintModal(discord.ui.Modal, title='Відправити жалобу'):
     complaint = discord.ui.TextInput(
@@ -1,37 +1,89 @@
+import io
 import discord
 from discord import app_commands
 from discord.ext import commands
-from modules.db import get_database
+from modules.db import users as users_repo, register_index, register_hot_query
+from modules.xp import get_score
+from modules.ranking import ranking
+from modules.leaderboard_card import leaderboard_cards
+from modules.http import close_session
+from modules.asset_cache import asset_cache
 
-db = get_database()
+register_index("users", [("guild_id", 1), ("score", -1), ("user_id", 1)])
+register_hot_query("users", {"guild_id": 0}, sort=[("score", -1), ("user_id", 1)])
+register_hot_query("users", {"guild_id": 0, "score": {"$gt": 0}})
+
+LEADERBOARD_FIELDS = {"user_id": 1, "xp": 1, "level": 1, "voice_minutes": 1, "reactions": 1, "score": 1}
+
+async def get_top(guild, limit):
+    """Топ учасників сервера: з рейтингу в пам'яті, поки він не завантажений - з БД"""
+    guild_ranking = ranking.get(guild.id)
+    if guild_ranking is None:
+        return await users_repo.top(
+            guild.id, limit, LEADERBOARD_FIELDS,
+            accept=lambda user_data: guild.get_member(user_data.get("user_id")) is not None
+        )
+
+    result = []
+    for _, user_id, entry in guild_ranking.iter_from(0):
+        if guild.get_member(user_id):
+            result.append({"user_id": user_id, **entry})
+            if len(result) >= limit:
+                break
+    return result
+
+async def get_position(guild, user_id):
+    """(позиція, дані) користувача або (None, None)"""
+    guild_ranking = ranking.get(guild.id)
+    if guild_ranking is not None:
+        entry = guild_ranking.get(user_id)
+        if entry is None:
+            return None, None
+        return guild_ranking.position(user_id), {"user_id": user_id, **entry}
+
+    user_data = await users_repo.get(guild.id, user_id)
+    if "_id" not in user_data:
+        return None, None
+    return await users_repo.rank(guild.id, get_score(user_data)), user_data
 
 class LeaderboardCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @app_commands.command(name="leaderboard", description="Показує топ користувачів")
-    async def leaderboard(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=False)
+    async def cog_unload(self):
+        await close_session()
 
-        users = await db.users.find({"guild_id": interaction.guild.id}).to_list(1000)
+    async def send_image(self, interaction: discord.Interaction, top_users):
+        rows = []
+        for position, user_data in enumerate(top_users, start=1):
+            member = interaction.guild.get_member(user_data["user_id"])
+            rows.append((
+                position,
+                member.display_name,
+                user_data.get("level", 0),
+                user_data.get("xp", 0),
+                member.display_avatar.replace(size=64, format="png").url
+            ))
 
-        def get_score(user):
-            return user.get("xp", 0) + user.get("level", 0) * 1000
+        image = await leaderboard_cards.build(interaction.guild.id, f"Лідерборд {interaction.guild.name}", rows, asset_cache.get_many)
+        await interaction.followup.send(file=discord.File(fp=io.BytesIO(image), filename="leaderboard.png"))
 
-        # Фільтруємо тільки користувачів, які є на сервері
-        active_users = []
-        for user_data in users:
-            member = interaction.guild.get_member(user_data.get("user_id"))
-            if member:  # Додаємо тільки якщо користувач є на сервері
-                active_users.append(user_data)
+    @app_commands.command(name="leaderboard", description="Показує топ користувачів")
+    @app_commands.describe(image="Показати лідерборд картинкою")
+    async def leaderboard(self, interaction: discord.Interaction, image: bool = False):
+        await interaction.response.defer(ephemeral=False)
+
+        # Тільки користувачі, які є на сервері
+        top_users = await get_top(interaction.guild, 10 if image else 20)
 
-        sorted_users = sorted(active_users, key=get_score, reverse=True)
+        if image:
+            await self.send_image(interaction, top_users)
+            return
 
         leaderboard_lines = ["📊 ЛІДЕРБОРД\n"]
-        author_id = str(interaction.user.id)
         found_author = False
 
-        for i, user_data in enumerate(sorted_users[:20], start=1):
+        for i, user_data in enumerate(top_users, start=1):
             member = interaction.guild.get_member(user_data.get("user_id"))
             name = member.display_name
 
@@ -52,19 +104,18 @@ class LeaderboardCommands(commands.Cog):
                 found_author = True
 
         if not found_author:
-            for i, user_data in enumerate(sorted_users, start=1):
-                if user_data.get("user_id") == interaction.user.id:
-                    # Конвертуємо хвилини в години для позиції користувача
-                    voice_minutes = user_data.get('voice_minutes', 0)
-                    voice_hours = round(voice_minutes / 60, 1)
-                    
-                    line = (
-                        f"\nТи на {i} місці:\n"
-                        f"Lvl: {user_data.get('level', 0)} | XP: {user_data.get('xp', 0)} | "
-                        f"Voice: {voice_hours} год | Реакцій: {user_data.get('reactions', 0)}"
-                    )
-                    leaderboard_lines.append(line)
-                    break
+            position, user_data = await get_position(interaction.guild, interaction.user.id)
+            if user_data:
+                # Конвертуємо хвилини в години для позиції користувача
+                voice_minutes = user_data.get('voice_minutes', 0)
+                voice_hours = round(voice_minutes / 60, 1)
+
+                line = (
+                    f"\nТи на {position} місці:\n"
+                    f"Lvl: {user_data.get('level', 0)} | XP: {user_data.get('xp', 0)} | "
+                    f"Voice: {voice_hours} год | Реакцій: {user_data.get('reactions', 0)}"
+                )
+                leaderboard_lines.append(line)
 
         result = "```\n" + "\n".join(leaderboard_lines) + "\n```"
         await interaction.followup.send(result)
@@ -3,9 +3,10 @@ from discord import app_commands
 from discord.ext import commands
 import aiohttp
 import random
-from modules.db import get_database
+from modules.db import guilds, register_index, register_hot_query
 
-db = get_database()
+register_index("guilds", [("guild_id", 1)])
+register_hot_query("guilds", {"guild_id": 0})
 
 class MemeCommands(commands.Cog):
     def __init__(self, bot):
@@ -17,7 +18,7 @@ class MemeCommands(commands.Cog):
 
         # Отримуємо налаштування гільдії (історію мемів)
         guild_id = interaction.guild_id
-        guild_data = await db.guilds.find_one({"guild_id": guild_id})
+        guild_data = await guilds.get(guild_id)
         seen_memes = guild_data.get("seen_memes", []) if guild_data else []
 
         # Використовуємо meme-api.com для отримання мемів з r/memes
@@ -63,11 +64,7 @@ class MemeCommands(commands.Cog):
                     if len(new_seen) > 200:
                         new_seen = new_seen[-200:]
                     
-                    await db.guilds.update_one(
-                        {"guild_id": guild_id},
-                        {"$set": {"seen_memes": new_seen}},
-                        upsert=True
-                    )
+                    await guilds.update(guild_id, {"seen_memes": new_seen})
             
             except Exception as e:
                 await interaction.followup.send(f"❌ Сталася помилка: {e}", ephemeral=True)
@@ -1,35 +1,36 @@
 import io
+import os
+import asyncio
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from modules.db import get_database
-
-db = get_database()
-
-async def get_user_data(guild_id, user_id):
-    user = await db.users.find_one({"guild_id": guild_id, "user_id": user_id})
-    if not user:
-        user = {
-            "guild_id": guild_id,
-            "user_id": user_id,
-            "xp": 0,
-            "level": 1,
-            "messages": 0,
-            "voice_minutes": 0,
-            "reactions": 0,
-            "history": {}
-        }
-        await db.users.insert_one(user)
-    return user
-
-def get_level_xp(level):
-    return 5 * (level ** 2) + 50 * level + 100
+from modules.db import users
+from modules.xp import get_level_xp, get_history, history_ordinal
+from modules.charts import charts
+from modules.rank_card import rank_cards
+from modules.asset_cache import asset_cache
+from modules.logger import Logger
+
+log = Logger("Profile")
+
+# card - картка на Pillow, chart - старий графік matplotlib
+PROFILE_RENDERER = os.getenv("PROFILE_RENDERER", "card")
 
 class ProfileCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.report_stats.start()
+
+    def cog_unload(self):
+        self.report_stats.cancel()
+        charts.shutdown()
+
+    @tasks.loop(minutes=30)
+    async def report_stats(self):
+        await self.bot.wait_until_ready()
+        # Влучання кешу аватарів (пам'ять/диск), промахи та невдалі завантаження
+        log.info(f"Asset cache stats: {asset_cache.stats()}")
 
     @app_commands.command(name="profile", description="Показує профіль користувача")
     @app_commands.describe(user="Користувач (за замовчуванням - ти)")
@@ -38,7 +39,7 @@ class ProfileCommands(commands.Cog):
 
         try:
             target_user = user or interaction.user
-            user_data = await get_user_data(interaction.guild.id, target_user.id)
+            user_data = await users.get(interaction.guild.id, target_user.id)
 
             current_level = user_data.get("level", 0)
             xp = user_data.get("xp", 0)
@@ -55,23 +56,24 @@ class ProfileCommands(commands.Cog):
             roles_display = ", ".join(roles) if roles else "Немає"
             joined_at = target_user.joined_at.strftime("%d %B %Y") if target_user.joined_at else "Невідомо"
 
-            history = user_data.get("history", {})
-            days = [datetime.now() - timedelta(days=i) for i in reversed(range(7))]
-            labels = [day.strftime('%a') for day in days]
-            xp_values = [history.get(day.strftime("%Y-%m-%d"), 0) for day in days]
-
-            plt.figure(figsize=(8, 4))
-            plt.plot(labels, xp_values, marker='o', linestyle='-', color='royalblue')
-            plt.title('Активність (XP за останні 7 днів)')
-            plt.xlabel('День тижня')
-            plt.ylabel('Отримано XP')
-            plt.grid(True, color='darkgray')
-            plt.tight_layout()
-
-            image_bytes = io.BytesIO()
-            plt.savefig(image_bytes, format='png')
-            plt.close()
-            image_bytes.seek(0)
+            if PROFILE_RENDERER == "chart":
+                days = [datetime.now() - timedelta(days=i) for i in reversed(range(7))]
+                labels = [day.strftime('%a') for day in days]
+                xp_values = get_history(user_data, len(days))
+
+                # Малюється в окремому процесі, повторні запити за день - з кешу
+                image = await charts.history_chart(
+                    interaction.guild.id, target_user.id, history_ordinal(), labels, xp_values
+                )
+            else:
+                # Аватар з кешу за хешем ассета - повторні /profile не ходять у CDN
+                avatar = await asset_cache.get(target_user.display_avatar.replace(size=256, format="png").url)
+                image = await asyncio.to_thread(
+                    rank_cards.render,
+                    target_user.display_name, current_level, xp, xp_needed,
+                    get_history(user_data, 14), avatar
+                )
+            image_bytes = io.BytesIO(image)
 
             filename = "profile_graph.png"
             file = discord.File(fp=image_bytes, filename=filename)
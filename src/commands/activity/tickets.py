@@ -3,17 +3,22 @@ from discord.ext import commands
 from discord import app_commands
 import asyncio
 from modules.logger import Logger
-from modules.db import get_database
+from modules.db import ticket_config, register_index, register_hot_query
+from modules.tickets import tickets, ticket_configs
 
 log = Logger("Tickets")
-db = get_database()
-collection = db.ticket_config
+
+register_index("tickets", [("guild_id", 1), ("opener_id", 1), ("state", 1)])
+register_index("tickets", [("channel_id", 1), ("state", 1)])
+register_hot_query("tickets", {"guild_id": 0, "opener_id": 0, "state": "open"})
+register_hot_query("tickets", {"channel_id": 0, "state": "open"})
 
 async def get_config(guild_id: int):
-    return await collection.find_one({"_id": guild_id}) or {}
+    return await ticket_configs.get(guild_id)
 
 async def update_config(guild_id: int, data: dict):
-    await collection.update_one({"_id": guild_id}, {"$set": data}, upsert=True)
+    await ticket_config.update(guild_id, data)
+    ticket_configs.invalidate(guild_id)
 
 # --- Modals ---
 
@@ -123,11 +128,15 @@ async def create_ticket_routine(interaction: discord.Interaction):
 
     channel_name = f"ticket-{user.name}".lower().replace(" ", "-")
     
-    # Check existing
-    existing_channel = discord.utils.get(guild.text_channels, name=channel_name, category_id=category.id)
-    if existing_channel:
-        await interaction.response.send_message(f"❌ У вас вже є відкритий тікет: {existing_channel.mention}", ephemeral=True)
-        return
+    # Check existing: реєстр за (сервер, автор), а не пошук каналу за ім'ям
+    existing_channel_id = await tickets.get_open(guild.id, user.id)
+    if existing_channel_id:
+        existing_channel = guild.get_channel(existing_channel_id)
+        if existing_channel:
+            await interaction.response.send_message(f"❌ У вас вже є відкритий тікет: {existing_channel.mention}", ephemeral=True)
+            return
+        # Канал видалили в обхід бота - закриваємо запис
+        await tickets.close(existing_channel_id, discord.utils.utcnow())
 
     # Permissions
     overwrites = {
@@ -155,6 +164,7 @@ async def create_ticket_routine(interaction: discord.Interaction):
         log.error(f"Failed to create ticket channel for {user}: {e}")
         return
 
+    await tickets.open(guild.id, user.id, channel.id, discord.utils.utcnow())
     await interaction.response.send_message(f"✅ Тікет створено: {channel.mention}", ephemeral=True)
 
     embed = discord.Embed(
@@ -244,6 +254,7 @@ class TicketControlView(discord.ui.View):
     async def close_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_message("Тікет буде закрито через 5 секунд...", ephemeral=True)
         await asyncio.sleep(5)
+        await tickets.close(interaction.channel.id, discord.utils.utcnow())
         await interaction.channel.delete()
 
 class TicketConfigView(discord.ui.View):
@@ -294,7 +305,8 @@ class TicketConfigView(discord.ui.View):
         confirm_view.add_item(discord.ui.Button(label="Так, скинути", style=discord.ButtonStyle.red, custom_id="confirm_reset"))
         
         async def confirm_callback(intx: discord.Interaction):
-            await collection.delete_one({"_id": intx.guild.id})
+            await ticket_config.delete(intx.guild.id)
+            ticket_configs.invalidate(intx.guild.id)
             await intx.response.edit_message(content="✅ Налаштування скинуто до заводських.", view=None)
             
         confirm_view.children[0].callback = confirm_callback
@@ -321,6 +333,32 @@ class TicketSystem(commands.Cog):
         self.bot.add_view(TicketControlView())
         self.bot.add_view(TicketConfigView())
         log.info("Ticket views registered")
+        self._adopted = set()
+        try:
+            await tickets.load()
+        except Exception as e:
+            log.error(f"Failed to load tickets, falling back to DB lookups: {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Одноразово: відкриті тікети, створені до появи реєстру
+        if not tickets.loaded:
+            return
+        for guild in self.bot.guilds:
+            if guild.id in self._adopted:
+                continue
+            self._adopted.add(guild.id)
+            try:
+                adopted = await tickets.adopt(guild, discord.utils.utcnow())
+                if adopted:
+                    log.info(f"Adopted {adopted} existing tickets in guild {guild.id}")
+            except Exception as e:
+                log.error(f"Failed to adopt tickets in guild {guild.id}: {e}")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        if tickets.is_ticket(channel.id):
+            await tickets.close(channel.id, discord.utils.utcnow())
 
     tickets_group = discord.app_commands.Group(
         name="tickets", 
@@ -1,10 +1,26 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
-from modules.db import get_database
+from discord.ext import commands, tasks
+from modules.db import register_index, register_hot_query
+from modules.voice_rooms import voice_rooms
+from modules.room_pool import room_pool
+from modules.room_teardown import room_teardown, reconcile_rooms
+from modules.channel_edits import channel_edits
+from modules.member_index import member_index
+from modules.logger import Logger
 import asyncio
+import time
 
-db = get_database()
+log = Logger("Rooms")
+
+register_index("private_rooms", [("owner_id", 1), ("active", 1)])
+register_index("private_rooms", [("channel_id", 1), ("active", 1)])
+register_index("private_rooms", [("guild_id", 1), ("active", 1)])
+register_index("server_configs", [("guild_id", 1)])
+register_hot_query("private_rooms", {"owner_id": 0, "active": True})
+register_hot_query("private_rooms", {"channel_id": 0, "active": True})
+register_hot_query("private_rooms", {"guild_id": 0, "active": True})
+register_hot_query("server_configs", {"guild_id": 0})
 
 # Модальні форми для різних налаштувань
 class RoomNameModal(discord.ui.Modal, title="Змінити назву кімнати"):
@@ -23,20 +39,13 @@ class RoomNameModal(discord.ui.Modal, title="Змінити назву кімн
         new_name = self.name_input.value
         
         # Знаходимо приватний канал користувача
-        user_room = await db.private_rooms.find_one({
-            "owner_id": self.user_id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(self.user_id)
         
         if user_room:
             channel = interaction.guild.get_channel(user_room["channel_id"])
             if channel:
-                await channel.edit(name=new_name)
-                # Оновлюємо в БД
-                await db.private_rooms.update_one(
-                    {"owner_id": self.user_id, "active": True},
-                    {"$set": {"name": new_name}}
-                )
+                # Зміна піде одним PATCH разом з іншими змінами кімнати за кілька секунд
+                channel_edits.queue(channel, user_room, {"name": new_name}, {"name": new_name}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Назву кімнати змінено на: **{new_name}**", ephemeral=True)
             else:
                 await interaction.response.send_message("❌ Не вдалося знайти твою кімнату!", ephemeral=True)
@@ -65,19 +74,12 @@ class RoomLimitModal(discord.ui.Modal, title="Встановити ліміт к
             await interaction.response.send_message("❌ Введіть правильне число!", ephemeral=True)
             return
 
-        user_room = await db.private_rooms.find_one({
-            "owner_id": self.user_id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(self.user_id)
         
         if user_room:
             channel = interaction.guild.get_channel(user_room["channel_id"])
             if channel:
-                await channel.edit(user_limit=limit if limit > 0 else None)
-                await db.private_rooms.update_one(
-                    {"owner_id": self.user_id, "active": True},
-                    {"$set": {"user_limit": limit}}
-                )
+                channel_edits.queue(channel, user_room, {"user_limit": limit}, {"user_limit": limit}, interaction=interaction)
                 limit_text = f"{limit} користувачів" if limit > 0 else "без ліміту"
                 await interaction.response.send_message(f"✅ Ліміт кімнати встановлено: **{limit_text}**", ephemeral=True)
             else:
@@ -88,7 +90,7 @@ class RoomLimitModal(discord.ui.Modal, title="Встановити ліміт к
 class UserMentionModal(discord.ui.Modal):
     user_input = discord.ui.TextInput(
         label="Згадай користувача",
-        placeholder="@користувач або ID користувача",
+        placeholder="@користувач, ID або ім'я користувача",
         required=True
     )
 
@@ -98,35 +100,24 @@ class UserMentionModal(discord.ui.Modal):
         self.action_type = action_type
 
     async def on_submit(self, interaction: discord.Interaction):
-        user_input = self.user_input.value.strip()
-        target_user = None
-        
-        # Спробуємо знайти користувача
-        if user_input.startswith('<@') and user_input.endswith('>'):
-            # Mention формат
-            user_id = user_input[2:-1].replace('!', '')
-            try:
-                target_user = await interaction.guild.fetch_member(int(user_id))
-            except:
-                pass
-        else:
-            # Спробуємо як ID
-            try:
-                target_user = await interaction.guild.fetch_member(int(user_input))
-            except:
-                # Спробуємо знайти по імені
-                target_user = discord.utils.get(interaction.guild.members, display_name=user_input)
-                if not target_user:
-                    target_user = discord.utils.get(interaction.guild.members, name=user_input)
+        # Згадка, ID або ім'я: спершу локальний індекс і кеш, REST - тільки для ID поза кешем
+        # Вигнати чи передати кімнату можна лише за точним ім'ям, згадкою або ID
+        exact = self.action_type in ("kick", "owner")
+        target_user, candidates = await member_index.resolve(interaction.guild, self.user_input.value, exact=exact)
+
+        if candidates:
+            names = ", ".join(f"{member.display_name} (`{member.id}`)" for member in candidates)
+            if exact and len(candidates) == 1:
+                await interaction.response.send_message(f"❓ Можливо, ти мав на увазі: {names}. Для цієї дії вкажи точне ім'я або ID.", ephemeral=True)
+            else:
+                await interaction.response.send_message(f"❓ Знайдено кількох користувачів: {names}. Уточни ім'я або вкажи ID.", ephemeral=True)
+            return
 
         if not target_user:
             await interaction.response.send_message("❌ Користувача не знайдено!", ephemeral=True)
             return
 
-        user_room = await db.private_rooms.find_one({
-            "owner_id": self.user_id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(self.user_id)
         
         if not user_room:
             await interaction.response.send_message("❌ У тебе немає активної приватної кімнати!", ephemeral=True)
@@ -140,33 +131,33 @@ class UserMentionModal(discord.ui.Modal):
         # Виконуємо дію в залежності від типу
         if self.action_type == "access":
             # Управління доступом
-            overwrites = channel.overwrites
+            overwrites = channel_edits.overwrites(channel)
             if target_user in overwrites:
                 # Користувач вже має налаштування - видаляємо їх
                 del overwrites[target_user]
-                await channel.edit(overwrites=overwrites)
+                channel_edits.queue(channel, user_room, {"overwrites": overwrites}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Скинуто права доступу для {target_user.display_name}", ephemeral=True)
             else:
                 # Даємо доступ
                 overwrites[target_user] = discord.PermissionOverwrite(connect=True, view_channel=True)
-                await channel.edit(overwrites=overwrites)
+                channel_edits.queue(channel, user_room, {"overwrites": overwrites}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Надано доступ користувачеві {target_user.display_name}", ephemeral=True)
                 
         elif self.action_type == "mic":
             # Управління мікрофоном
-            overwrites = channel.overwrites
+            overwrites = channel_edits.overwrites(channel)
             current_perms = overwrites.get(target_user, discord.PermissionOverwrite())
             if current_perms.speak is False:
                 # Повертаємо право говорити
                 current_perms.speak = True
                 overwrites[target_user] = current_perms
-                await channel.edit(overwrites=overwrites)
+                channel_edits.queue(channel, user_room, {"overwrites": overwrites}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Повернуто право говорити для {target_user.display_name}", ephemeral=True)
             else:
                 # Забираємо право говорити
                 current_perms.speak = False
                 overwrites[target_user] = current_perms
-                await channel.edit(overwrites=overwrites)
+                channel_edits.queue(channel, user_room, {"overwrites": overwrites}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Заборонено говорити користувачеві {target_user.display_name}", ephemeral=True)
                 
         elif self.action_type == "kick":
@@ -179,23 +170,18 @@ class UserMentionModal(discord.ui.Modal):
                 
         elif self.action_type == "reset":
             # Скидаємо права
-            overwrites = channel.overwrites
+            overwrites = channel_edits.overwrites(channel)
             if target_user in overwrites:
                 del overwrites[target_user]
-                await channel.edit(overwrites=overwrites)
+                channel_edits.queue(channel, user_room, {"overwrites": overwrites}, interaction=interaction)
                 await interaction.response.send_message(f"✅ Скинуто всі права для {target_user.display_name}", ephemeral=True)
             else:
                 await interaction.response.send_message(f"❌ У користувача {target_user.display_name} немає особливих прав", ephemeral=True)
                 
         elif self.action_type == "owner":
             # Передача власності
-            await db.private_rooms.update_one(
-                {"owner_id": self.user_id, "active": True},
-                {"$set": {"owner_id": target_user.id}}
-            )
-            
             # Оновлюємо права каналу
-            overwrites = channel.overwrites
+            overwrites = channel_edits.overwrites(channel)
             # Забираємо права у старого власника
             overwrites[interaction.user] = discord.PermissionOverwrite(
                 connect=True, view_channel=True, manage_channels=False, manage_permissions=False
@@ -204,7 +190,7 @@ class UserMentionModal(discord.ui.Modal):
             overwrites[target_user] = discord.PermissionOverwrite(
                 connect=True, view_channel=True, manage_channels=True, manage_permissions=True
             )
-            await channel.edit(overwrites=overwrites)
+            channel_edits.queue(channel, user_room, {"overwrites": overwrites}, {"owner_id": target_user.id}, interaction=interaction)
             
             await interaction.response.send_message(f"✅ Власність кімнати передано користувачеві {target_user.display_name}", ephemeral=True)
 
@@ -214,10 +200,7 @@ class RoomManagementView(discord.ui.View):
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         """Перевіряє чи користувач має право використовувати кнопки"""
-        user_room = await db.private_rooms.find_one({
-            "owner_id": interaction.user.id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(interaction.user.id)
         
         if not user_room:
             await interaction.response.send_message("❌ У тебе немає приватного каналу! Зайди в канал-створювач щоб створити свій.", ephemeral=True)
@@ -239,15 +222,12 @@ class RoomManagementView(discord.ui.View):
     @discord.ui.button(emoji="<:lock_unlock:1405110188259934298>", style=discord.ButtonStyle.secondary, row=0, custom_id="room_toggle_lock")
     async def toggle_lock(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Закрити/відкрити доступ"""
-        user_room = await db.private_rooms.find_one({
-            "owner_id": interaction.user.id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(interaction.user.id)
         
         if user_room:
             channel = interaction.guild.get_channel(user_room["channel_id"])
             if channel:
-                overwrites = channel.overwrites
+                overwrites = channel_edits.overwrites(channel)
                 everyone = interaction.guild.default_role
                 
                 current_perms = overwrites.get(everyone, discord.PermissionOverwrite())
@@ -255,35 +235,24 @@ class RoomManagementView(discord.ui.View):
                     # Відкриваємо доступ
                     current_perms.connect = None  # Повертаємо до стандартних налаштувань
                     overwrites[everyone] = current_perms
-                    await channel.edit(overwrites=overwrites)
-                    await db.private_rooms.update_one(
-                        {"owner_id": interaction.user.id, "active": True},
-                        {"$set": {"locked": False}}
-                    )
+                    channel_edits.queue(channel, user_room, {"overwrites": overwrites}, {"locked": False}, interaction=interaction)
                     await interaction.response.send_message("🔓 Кімнату відкрито для всіх!", ephemeral=True)
                 else:
                     # Закриваємо доступ
                     current_perms.connect = False
                     overwrites[everyone] = current_perms
-                    await channel.edit(overwrites=overwrites)
-                    await db.private_rooms.update_one(
-                        {"owner_id": interaction.user.id, "active": True},
-                        {"$set": {"locked": True}}
-                    )
+                    channel_edits.queue(channel, user_room, {"overwrites": overwrites}, {"locked": True}, interaction=interaction)
                     await interaction.response.send_message("🔒 Кімнату закрито для нових користувачів!", ephemeral=True)
 
     @discord.ui.button(emoji="<:eye_closed:1405110183385894932>", style=discord.ButtonStyle.secondary, row=0, custom_id="room_toggle_visibility")
     async def toggle_visibility(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Сховати/показати кімнату"""
-        user_room = await db.private_rooms.find_one({
-            "owner_id": interaction.user.id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(interaction.user.id)
         
         if user_room:
             channel = interaction.guild.get_channel(user_room["channel_id"])
             if channel:
-                overwrites = channel.overwrites
+                overwrites = channel_edits.overwrites(channel)
                 everyone = interaction.guild.default_role
                 
                 current_perms = overwrites.get(everyone, discord.PermissionOverwrite())
@@ -291,21 +260,13 @@ class RoomManagementView(discord.ui.View):
                     # Показуємо кімнату
                     current_perms.view_channel = None
                     overwrites[everyone] = current_perms
-                    await channel.edit(overwrites=overwrites)
-                    await db.private_rooms.update_one(
-                        {"owner_id": interaction.user.id, "active": True},
-                        {"$set": {"hidden": False}}
-                    )
+                    channel_edits.queue(channel, user_room, {"overwrites": overwrites}, {"hidden": False}, interaction=interaction)
                     await interaction.response.send_message("👁️ Кімнату зроблено видимою для всіх!", ephemeral=True)
                 else:
                     # Ховаємо кімнату
                     current_perms.view_channel = False
                     overwrites[everyone] = current_perms
-                    await channel.edit(overwrites=overwrites)
-                    await db.private_rooms.update_one(
-                        {"owner_id": interaction.user.id, "active": True},
-                        {"$set": {"hidden": True}}
-                    )
+                    channel_edits.queue(channel, user_room, {"overwrites": overwrites}, {"hidden": True}, interaction=interaction)
                     await interaction.response.send_message("🙈 Кімнату сховано від інших користувачів!", ephemeral=True)
 
     @discord.ui.button(emoji="<:plus:1405110182014357595>", style=discord.ButtonStyle.secondary, row=0, custom_id="room_manage_access")
@@ -341,10 +302,7 @@ class RoomManagementView(discord.ui.View):
     @discord.ui.button(emoji="<:room_info:1405110199127248896>", style=discord.ButtonStyle.primary, row=1, custom_id="room_info")
     async def room_info(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Інформація про кімнату"""
-        user_room = await db.private_rooms.find_one({
-            "owner_id": interaction.user.id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(interaction.user.id)
         
         if user_room:
             channel = interaction.guild.get_channel(user_room["channel_id"])
@@ -360,7 +318,7 @@ class RoomManagementView(discord.ui.View):
                     title="📋 Інформація про твою кімнату",
                     color=0x7c7cf0,
                     description=(
-                        f"🏠 **Назва:** {channel.name}\n"
+                        f"🏠 **Назва:** {user_room.get('name', channel.name)}\n"
                         f"👥 **Учасників:** {member_count}\n"
                         f"📊 **Ліміт:** {limit_text}\n"
                         f"🔒 **Статус:** {'Закрито' if locked else 'Відкрито'}\n"
@@ -378,77 +336,136 @@ class RoomManagementCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def cog_load(self):
+        # Реєстр кімнат у пам'яті: гарячий шлях voice-подій не читає БД
+        try:
+            await voice_rooms.load()
+        except Exception as e:
+            log.error(f"Failed to load voice rooms, falling back to DB lookups: {e}")
+        # Навіть з вимкненим пулом: refill прибирає запасні канали, що лишились від більшого ROOM_POOL_SIZE
+        self.refill_pool.start()
+        self.reconcile.start()
+        self.report_stats.start()
+
+    async def cog_unload(self):
+        self.refill_pool.cancel()
+        self.reconcile.cancel()
+        self.report_stats.cancel()
+        await channel_edits.flush()
+        await room_teardown.flush()
+
+    @tasks.loop(minutes=30)
+    async def reconcile(self):
+        """Після старту і далі періодично: кімнати, що спорожніли, поки бот був офлайн"""
+        await self.bot.wait_until_ready()
+        try:
+            report = await reconcile_rooms(self.bot.guilds)
+        except Exception as e:
+            log.error(f"Room reconciliation failed: {e}")
+            return
+        if report["deleted_channels"] or report["stale_rows"] or report["failed"]:
+            log.info(f"Room reconciliation: {report}")
+
+    @tasks.loop(seconds=15)
+    async def refill_pool(self):
+        await self.bot.wait_until_ready()
+        for guild_id, creator_channel_id in voice_rooms.creators().items():
+            guild = self.bot.get_guild(guild_id)
+            creator_channel = guild.get_channel(creator_channel_id) if guild else None
+            if not creator_channel or not creator_channel.category:
+                continue
+            try:
+                await room_pool.refill(guild, creator_channel.category)
+            except discord.HTTPException as e:
+                log.warning(f"Failed to refill room pool in guild {guild_id}: {e}")
+
+    @tasks.loop(minutes=30)
+    async def report_stats(self):
+        await self.bot.wait_until_ready()
+        # Час від входу в канал-створювач до готової кімнати (p50/p95) і скільки кімнат видано з пулу
+        log.info(f"Room pool stats: {room_pool.stats()}")
+        # Глибина черги змін каналів і скільки викликів злито в один PATCH
+        log.info(f"Channel edit queue stats: {channel_edits.stats()}")
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         """Обробляє зміни voice статусу"""
-        # Перевіряємо чи користувач зайшов в канал-створювач
+        # Mute, deafen, стрім - канал не змінився, кімнатам тут нічого робити
+        if before.channel == after.channel:
+            return
+
+        # Повернення в кімнату, що чекає на видалення, скасовує його
         if after.channel:
-            # Знаходимо налаштування сервера
-            server_config = await db.server_configs.find_one({"guild_id": member.guild.id})
-            if server_config and after.channel.id == server_config.get("creator_channel_id"):
-                await self.create_private_room(member, after.channel)
+            room_teardown.cancel(member.guild.id, after.channel.id)
+
+        # Перевіряємо чи користувач зайшов в канал-створювач
+        if after.channel and await voice_rooms.is_creator(member.guild.id, after.channel.id):
+            await self.create_private_room(member, after.channel)
         
         # Перевіряємо чи користувач покинув свій приватний канал
         if before.channel:
-            user_room = await db.private_rooms.find_one({
-                "channel_id": before.channel.id,
-                "active": True
-            })
+            user_room = await voice_rooms.get_by_channel(before.channel.id)
             if user_room and len(before.channel.members) == 0:
-                # Канал порожній, видаляємо його
-                await self.delete_private_room(before.channel, user_room)
+                # Канал порожній: видалення після grace-періоду, якщо ніхто не повернеться
+                room_teardown.schedule(before.channel, user_room)
 
     async def create_private_room(self, member, creator_channel):
         """Створити приватну кімнату для користувача"""
-        # Перевіряємо чи вже має активну кімнату
-        existing_room = await db.private_rooms.find_one({
-            "owner_id": member.id,
-            "active": True
-        })
-        
-        if existing_room:
-            # Переносимо в існуючу кімнату
-            existing_channel = member.guild.get_channel(existing_room["channel_id"])
-            if existing_channel:
-                await member.move_to(existing_channel)
-                return
-
-        # Створюємо новий приватний канал
-        overwrites = {
-            member.guild.default_role: discord.PermissionOverwrite(connect=True, view_channel=True),
-            member: discord.PermissionOverwrite(connect=True, view_channel=True, manage_channels=True, manage_permissions=True)
-        }
-
-        channel_name = f"{member.display_name}'s Room"
-        private_channel = await creator_channel.category.create_voice_channel(
-            name=channel_name,
-            overwrites=overwrites,
-            user_limit=None
-        )
-
-        # Переносимо користувача в новий канал
-        await member.move_to(private_channel)
-
-        # Зберігаємо в БД
-        await db.private_rooms.insert_one({
-            "owner_id": member.id,
-            "channel_id": private_channel.id,
-            "guild_id": member.guild.id,
-            "name": channel_name,
-            "active": True,
-            "user_limit": 0,
-            "locked": False,
-            "hidden": False,
-            "created_at": discord.utils.utcnow()
-        })
+        started = time.perf_counter()
+        # Черга сервера: під час напливу кімнати видаються по одній, без гонок за запасні канали
+        async with room_pool.lock(member.guild.id):
+            # Перевіряємо чи вже має активну кімнату
+            existing_room = await voice_rooms.get_by_owner(member.id)
+
+            if existing_room:
+                # Переносимо в існуючу кімнату
+                existing_channel = member.guild.get_channel(existing_room["channel_id"])
+                if existing_channel:
+                    await member.move_to(existing_channel)
+                    return
+
+            overwrites = {
+                member.guild.default_role: discord.PermissionOverwrite(connect=True, view_channel=True),
+                member: discord.PermissionOverwrite(connect=True, view_channel=True, manage_channels=True, manage_permissions=True)
+            }
+            channel_name = f"{member.display_name}'s Room"
+
+            # Запасний канал з пулу: одне перейменування з новими правами замість створення
+            private_channel = room_pool.acquire(member.guild)
+            pooled = private_channel is not None
+            if pooled:
+                try:
+                    await private_channel.edit(name=channel_name, overwrites=overwrites, user_limit=0)
+                except discord.NotFound:
+                    pooled = False
+                except discord.HTTPException as e:
+                    # Канал лишився прихованим запасним - повертаємо в пул і створюємо кімнату звичайним шляхом
+                    log.warning(f"Failed to convert spare room {private_channel.id}: {e}")
+                    room_pool.release(member.guild, private_channel)
+                    pooled = False
+            if not pooled:
+                private_channel = await creator_channel.category.create_voice_channel(
+                    name=channel_name,
+                    overwrites=overwrites,
+                    user_limit=None
+                )
 
-    async def delete_private_room(self, channel, room_data):
-        """Видалити приватну кімнату"""
-        await channel.delete()
-        await db.private_rooms.update_one(
-            {"_id": room_data["_id"]},
-            {"$set": {"active": False, "deleted_at": discord.utils.utcnow()}}
-        )
+            # Переносимо користувача в новий канал
+            await member.move_to(private_channel)
+            room_pool.record(started, pooled)
+
+            # Зберігаємо в БД
+            await voice_rooms.create({
+                "owner_id": member.id,
+                "channel_id": private_channel.id,
+                "guild_id": member.guild.id,
+                "name": channel_name,
+                "active": True,
+                "user_limit": 0,
+                "locked": False,
+                "hidden": False,
+                "created_at": discord.utils.utcnow()
+            })
 
     @app_commands.command(name="room-setup", description="[АДМІН] Налаштування системи приватних кімнат")
     @app_commands.describe(
@@ -478,18 +495,12 @@ class RoomManagementCommands(commands.Cog):
                     break
 
         # Зберігаємо конфігурацію
-        await db.server_configs.update_one(
-            {"guild_id": interaction.guild.id},
-            {
-                "$set": {
-                    "creator_channel_id": creator_channel.id,
-                    "management_channel_id": management_channel.id,
-                    "configured_by": interaction.user.id,
-                    "configured_at": discord.utils.utcnow()
-                }
-            },
-            upsert=True
-        )
+        await voice_rooms.set_config(interaction.guild.id, {
+            "creator_channel_id": creator_channel.id,
+            "management_channel_id": management_channel.id,
+            "configured_by": interaction.user.id,
+            "configured_at": discord.utils.utcnow()
+        })
 
         # Створюємо embed та view для панелі управління
         embed = discord.Embed(
@@ -533,10 +544,7 @@ class RoomManagementCommands(commands.Cog):
 
     async def get_user_private_channel(self, user_id):
         """Отримати приватний канал користувача з БД"""
-        user_room = await db.private_rooms.find_one({
-            "owner_id": user_id,
-            "active": True
-        })
+        user_room = await voice_rooms.get_by_owner(user_id)
         return user_room
 
 async def setup(bot):
@@ -1,115 +1,106 @@
-import discord
+import asyncio
 from discord.ext import commands, tasks
-from datetime import datetime
-from src.modules.db import get_database
+from modules.db import get_database, users, register_hot_query
+from modules.logger import Logger
+from modules.xp import XPAccumulator, migrate_history, backfill_scores, merge_duplicate_users, ensure_unique_users
+from modules.voice_sessions import VoiceSessionTracker
+from modules.ranking import ranking
+from modules.pipeline import pipeline
 
+log = Logger("Activity")
 db = get_database()
 
-async def get_user_data(guild_id, user_id):
-    user = await db.users.find_one({"guild_id": guild_id, "user_id": user_id})
-    if not user:
-        user = {
-            "guild_id": guild_id,
-            "user_id": user_id,
-            "xp": 0,
-            "level": 1,
-            "messages": 0,
-            "voice_minutes": 0,
-            "reactions": 0,
-            "history": {}
-        }
-        await db.users.insert_one(user)
-    return user
-
-async def update_user_data(guild_id, user: discord.Member, update_data):
-    # Додаємо збереження імені та аватару для сайту
-    update_data["username"] = user.display_name
-    update_data["avatar"] = user.display_avatar.url if user.display_avatar else None
-    
-    await db.users.update_one(
-        {"guild_id": guild_id, "user_id": user.id},
-        {"$set": update_data}
-    )
-
-def get_level_xp(level):
-    return 5 * (level ** 2) + 50 * level + 100
-
-async def level_up_check(message, user_data):
-    needed_xp = get_level_xp(user_data["level"])
-    if user_data["xp"] >= needed_xp:
-        user_data["xp"] -= needed_xp
-        user_data["level"] += 1
-        
-        # Передаємо об'єкт member, а не просто ID
-        await update_user_data(message.guild.id, message.author, {
-            "xp": user_data["xp"],
-            "level": user_data["level"]
-        })
+# Унікальний індекс (guild_id, user_id) створює ensure_unique_users у cog_load - після злиття дублікатів
+register_hot_query("users", {"guild_id": 0, "user_id": 0})
 
 class ActivityEvents(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.update_voice_time.start()
+        self.accumulator = XPAccumulator(users, on_flush=ranking.apply_deltas)
+        self.voice = VoiceSessionTracker(self.accumulator, db.voice_sessions)
+        self.voice_checkpoint.start()
+        self.verify_ranking.start()
+
+    async def cog_load(self):
+        # До першого flush: дублікати користувачів зливаються, і лише тоді повтор запису може робити upsert
+        try:
+            await merge_duplicate_users(users.collection, db.migrations)
+            unique = await ensure_unique_users(users.collection)
+        except Exception as e:
+            log.error(f"Failed to merge duplicate users: {e}")
+            unique = False
+        if not unique:
+            log.error("users (guild_id, user_id) is NOT unique: XP retries run without upsert until this is fixed")
+        self.accumulator.retry_upsert = unique
+
+        # XP нараховується стадією конвеєра подій, запис - на його спільному flush
+        pipeline.register("message", "xp", self.message_xp)
+        pipeline.register("reaction_add", "xp", self.reaction_xp)
+        pipeline.register_sink("xp", self.accumulator.collect)
+
+        # Міграція старого формату history працює у фоні порціями
+        self.migration_task = asyncio.create_task(self.run_migrations())
+
+    async def run_migrations(self):
+        try:
+            await backfill_scores(users.collection)
+            await ranking.load(users)
+            await migrate_history(users.collection, db.migrations)
+        except Exception as e:
+            log.error(f"History migration interrupted: {e}")
+
+    async def cog_unload(self):
+        self.migration_task.cancel()
+        pipeline.unregister("xp")
+        self.voice_checkpoint.cancel()
+        self.verify_ranking.cancel()
+        # Скидаємо все, що не встигли записати: збій чекпоінту voice не повинен втратити буфер XP
+        try:
+            await self.voice.checkpoint()
+        except Exception as e:
+            log.error(f"Voice checkpoint on unload failed: {e}")
+        finally:
+            await self.accumulator.flush()
+
+    def message_xp(self, message):
+        self.accumulator.add(message.guild.id, message.author, xp=10, messages=1)
+
+    def reaction_xp(self, reaction, user):
+        self.accumulator.add(reaction.message.guild.id, user, xp=2, reactions=1)
 
     @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
-        user_data = await get_user_data(message.guild.id, message.author.id)
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        history = user_data.get("history", {})
-        history[today] = history.get(today, 0) + 10
-        
-        update_data = {
-            "xp": user_data["xp"] + 10,
-            "messages": user_data["messages"] + 1,
-            "history": history
-        }
-        
-        user_data.update(update_data)
-        await update_user_data(message.guild.id, message.author, update_data)
-        await level_up_check(message, user_data)
+    async def on_ready(self):
+        # Підхоплюємо тих, хто вже сидить у voice (рестарт або реконект)
+        await self.voice.sync(self.bot.guilds)
 
     @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        if user.bot:
+    async def on_voice_state_update(self, member, before, after):
+        if member.bot or before.channel == after.channel:
             return
-        
-        user_data = await get_user_data(reaction.message.guild.id, user.id)
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        history = user_data.get("history", {})
-        history[today] = history.get(today, 0) + 2
-        
-        update_data = {
-            "xp": user_data["xp"] + 2,
-            "reactions": user_data["reactions"] + 1,
-            "history": history
-        }
-        
-        await update_user_data(reaction.message.guild.id, user, update_data)
-
-    @tasks.loop(minutes=1)
-    async def update_voice_time(self):
+
+        if after.channel and not before.channel:
+            self.voice.join(member)
+        elif before.channel and not after.channel:
+            self.voice.leave(member)
+
+    @tasks.loop(minutes=5)
+    async def voice_checkpoint(self):
+        await self.bot.wait_until_ready()
+        try:
+            await self.voice.checkpoint()
+        except Exception as e:
+            log.error(f"Voice checkpoint failed: {e}")
+
+    @tasks.loop(minutes=30)
+    async def verify_ranking(self):
+        await self.bot.wait_until_ready()
         for guild in self.bot.guilds:
-            for vc in guild.voice_channels:
-                for member in vc.members:
-                    if not member.bot:
-                        user_data = await get_user_data(guild.id, member.id)
-                        
-                        today = datetime.now().strftime("%Y-%m-%d")
-                        history = user_data.get("history", {})
-                        history[today] = history.get(today, 0) + 5
-                        
-                        update_data = {
-                            "xp": user_data["xp"] + 5,
-                            "voice_minutes": user_data["voice_minutes"] + 1,
-                            "history": history
-                        }
-                        
-                        await update_user_data(guild.id, member, update_data)
+            if not ranking.is_loaded(guild.id):
+                continue
+            try:
+                await ranking.verify(users, guild.id)
+            except Exception as e:
+                log.error(f"Ranking check failed for guild {guild.id}: {e}")
 
 async def setup(bot):
-    await bot.add_cog(ActivityEvents(bot))
\ No newline at end of file
+    await bot.add_cog(ActivityEvents(bot))
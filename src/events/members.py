@@ -0,0 +1,47 @@
+from discord.ext import commands
+from modules.member_index import member_index
+
+class MemberIndexEvents(commands.Cog):
+    """Підтримує індекс імен учасників в актуальному стані"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        for guild in self.bot.guilds:
+            member_index.build(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        member_index.build(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        member_index.drop(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        member_index.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if before.display_name != after.display_name:
+            member_index.add(after)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        if before.name == after.name and before.global_name == after.global_name:
+            return
+        # Ім'я акаунта спільне для всіх серверів
+        for guild in self.bot.guilds:
+            member = guild.get_member(after.id)
+            if member:
+                member_index.add(member)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        member_index.remove(member.guild.id, member.id)
+
+async def setup(bot):
+    await bot.add_cog(MemberIndexEvents(bot))
@@ -0,0 +1,75 @@
+import time
+from discord.ext import commands, tasks
+from modules.pipeline import pipeline
+from modules.logger import Logger
+
+log = Logger("Pipeline")
+
+# Більше FLOOD_MESSAGES повідомлень за FLOOD_WINDOW секунд від одного користувача не рахуються ні в XP, ні в статистиці
+FLOOD_MESSAGES = 5
+FLOOD_WINDOW = 5
+
+class EventPipelineEvents(commands.Cog):
+    """Єдині слухачі повідомлень і реакцій: подія проходить стадії конвеєра, запис - раз на flush"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._windows = {}  # (guild_id, user_id) -> [початок вікна, кількість]
+        self.flush_events.start()
+        self.report_stats.start()
+
+    async def cog_load(self):
+        pipeline.register("message", "filter", self.filter_message, order=0)
+        pipeline.register("message", "antispam", self.antispam, order=10)
+        pipeline.register("reaction_add", "filter", self.filter_reaction, order=0)
+
+    async def cog_unload(self):
+        self.flush_events.cancel()
+        self.report_stats.cancel()
+        pipeline.unregister("filter")
+        pipeline.unregister("antispam")
+        await pipeline.flush()
+
+    def filter_message(self, message):
+        return not message.author.bot and message.guild is not None
+
+    def filter_reaction(self, reaction, user):
+        return not user.bot and reaction.message.guild is not None
+
+    def antispam(self, message):
+        key = (message.guild.id, message.author.id)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] > FLOOD_WINDOW:
+            self._windows[key] = [now, 1]
+            return True
+        window[1] += 1
+        return window[1] <= FLOOD_MESSAGES
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        await pipeline.dispatch("message", message)
+
+    @commands.Cog.listener()
+    async def on_reaction_add(self, reaction, user):
+        await pipeline.dispatch("reaction_add", reaction, user)
+
+    @tasks.loop(seconds=5)
+    async def flush_events(self):
+        # Виняток усередині tasks.loop зупинив би його назавжди
+        try:
+            await pipeline.flush()
+        except Exception as e:
+            log.error(f"Event pipeline flush failed: {e}")
+
+        # Прибираємо вікна антиспаму, що вже закінчились
+        now = time.monotonic()
+        self._windows = {key: window for key, window in self._windows.items() if now - window[0] <= FLOOD_WINDOW}
+
+    @tasks.loop(minutes=30)
+    async def report_stats(self):
+        await self.bot.wait_until_ready()
+        log.info(f"Event pipeline stats: {pipeline.stats()}")
+
+async def setup(bot):
+    await bot.add_cog(EventPipelineEvents(bot))
@@ -1,19 +1,89 @@
+import asyncio
+import hashlib
+import time
 import discord
 from discord.ext import commands, tasks
-from src.modules.db import get_database
+from modules.db import site_stats
+from modules.rolling_counter import RollingCounters
+from modules.pipeline import pipeline, PendingWrite
+from modules.logger import Logger
 
-db = get_database()
+log = Logger("Stats")
+
+# Перепідключення часто йдуть серіями - синхронізуємо раз після затишшя
+READY_DEBOUNCE = 30
+READY_MIN_INTERVAL = 120
+# Лічильники, які пишуться для кожного сервера (нулі, якщо подій не було)
+COUNTERS = ("messages", "mod_actions")
 
 class BotStats(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self._fingerprints = {}  # doc_id -> відбиток останніх записаних значень
+        self._lock = asyncio.Lock()
+        self._ready_task = None
+        self._last_sync = 0.0
+        # Лічильники повідомлень і модерації живуть у пам'яті, в БД - тільки підсумки вікон
+        self.counters = RollingCounters(COUNTERS)
+        self._counters_minute = None
+        # Поки вікна не продовжені зі збережених підсумків, нулі з пам'яті перезаписали б їх у БД
+        self._seeded = False
+        self._seed_task = None
         self.update_stats.start()
 
-    def cog_unload(self):
+    async def cog_load(self):
+        # Підсумки вікон пишуться разом з рештою змін на flush конвеєра подій
+        pipeline.register("message", "stats", self.count_message)
+        pipeline.register_sink("stats", self.collect_counters)
+        self._seed_task = asyncio.create_task(self.seed_counters())
+
+    async def seed_counters(self):
+        """Після рестарту вікна продовжуються з підсумків у site_stats, а не з нуля"""
+        fields = [f"{name}_{window}" for name in COUNTERS for window in ("24h", "7d")]
+        projection = {field: 1 for field in fields + ["counters_minute"]}
+        while True:
+            try:
+                docs = await site_stats.collection.find({"$or": [{field: {"$exists": True}} for field in fields]}, projection).to_list(None)
+                break
+            except Exception as e:
+                log.error(f"Failed to load stored counters, retrying: {e}")
+                await asyncio.sleep(60)
+
+        for doc in docs:
+            try:
+                guild_id = int(doc["_id"])
+            except (TypeError, ValueError):
+                continue
+            self.counters.seed(guild_id, doc, doc.get("counters_minute"))
+        self._seeded = True
+        log.info(f"Counters seeded for {len(docs)} guilds")
+
+    async def cog_unload(self):
         self.update_stats.cancel()
+        pipeline.unregister("stats")
+        if self._seed_task:
+            self._seed_task.cancel()
+        self._counters_minute = None
+        write = self.collect_counters()
+        if write:
+            try:
+                await site_stats.bulk_write(write.ops)
+                write.on_success()
+            except Exception as e:
+                log.error(f"Error flushing counters: {e}")
+        if self._ready_task:
+            self._ready_task.cancel()
 
     @commands.Cog.listener()
     async def on_ready(self):
+        if self._ready_task and not self._ready_task.done():
+            return
+        self._ready_task = asyncio.create_task(self._sync_after_ready())
+
+    async def _sync_after_ready(self):
+        await asyncio.sleep(READY_DEBOUNCE)
+        if time.monotonic() - self._last_sync < READY_MIN_INTERVAL:
+            return
         await self.update_stats_logic()
 
     @tasks.loop(minutes=5.0)
@@ -21,65 +91,94 @@ class BotStats(commands.Cog):
         await self.bot.wait_until_ready()
         await self.update_stats_logic()
 
+    def collect_stats(self) -> dict:
+        """{doc_id: значення} без last_updated"""
+        docs = {
+            "general_stats": {
+                "server_count": len(self.bot.guilds),
+                "member_count": sum(guild.member_count or 0 for guild in self.bot.guilds),
+                "guild_ids": [str(guild.id) for guild in self.bot.guilds]
+            }
+        }
+        for guild in self.bot.guilds:
+            docs[str(guild.id)] = {
+                "guild_id": str(guild.id),
+                "name": guild.name,
+                "member_count": guild.member_count,
+                "icon": str(guild.icon.url) if guild.icon else None
+            }
+        return docs
+
+    @staticmethod
+    def fingerprint(data: dict) -> str:
+        return hashlib.sha1(repr(sorted(data.items())).encode()).hexdigest()
+
     async def update_stats_logic(self):
-        try:
-            total_server_count = len(self.bot.guilds)
-            total_member_count = sum(guild.member_count for guild in self.bot.guilds)
-            all_guild_ids = [str(guild.id) for guild in self.bot.guilds]
-
-            await db.site_stats.update_one(
-                {"_id": "general_stats"}, 
-                {"$set": {
-                    "server_count": total_server_count,
-                    "member_count": total_member_count,
-                    "guild_ids": all_guild_ids,
-                    "last_updated": discord.utils.utcnow()
-                }},
-                upsert=True
-            )
-
-            for guild in self.bot.guilds:
-                await db.site_stats.update_one(
-                    {"_id": str(guild.id)},
-                    {"$set": {
-                        "guild_id": str(guild.id),
-                        "name": guild.name,
-                        "member_count": guild.member_count,
-                        "icon": str(guild.icon.url) if guild.icon else None,
-                        "last_updated": discord.utils.utcnow()
-                    }},
-                    upsert=True
-                )
-            
-        except Exception as e:
-            print(f"Error in update_stats: {e}")
+        async with self._lock:
+            try:
+                changed = {}
+                fingerprints = {}
+                for doc_id, data in self.collect_stats().items():
+                    fingerprint = self.fingerprint(data)
+                    if self._fingerprints.get(doc_id) != fingerprint:
+                        changed[doc_id] = {**data, "last_updated": discord.utils.utcnow()}
+                        fingerprints[doc_id] = fingerprint
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.guild:
-            return
+                await site_stats.set_many(changed)
+                # Відбитки оновлюємо тільки після успішного запису
+                self._fingerprints.update(fingerprints)
+                self._last_sync = time.monotonic()
+                log.info(f"Site stats synced: {len(changed)} written, {len(self.bot.guilds) + 1 - len(changed)} skipped")
 
-        await db.site_stats.update_one(
-            {"_id": str(message.guild.id)},
-            {"$inc": {"messages_24h": 1}},
-            upsert=True
+            except Exception as e:
+                log.error(f"Error in update_stats: {e}")
+
+    def collect_counters(self):
+        if not self._seeded:
+            return None
+        # Вікна мають хвилинну точність - частіше за раз на хвилину писати нічого
+        minute = int(time.time() // 60)
+        if minute == self._counters_minute:
+            return None
+        # Сервери без подій теж отримують (нульові) вікна, інакше на сайті лишаються старі підсумки
+        for guild in self.bot.guilds:
+            self.counters.track(guild.id)
+        # Лише сервери, чиї підсумки змінилися з останнього запису
+        changed = self.counters.snapshot()
+        if not changed:
+            self._counters_minute = minute
+            return None
+
+        def on_success():
+            self._counters_minute = minute
+            self.counters.mark_written(changed)
+
+        return PendingWrite(
+            site_stats,
+            site_stats.set_ops({str(guild_id): {**values, "counters_minute": minute} for guild_id, values in changed.items()}),
+            on_success=on_success
         )
 
+    def count_message(self, message):
+        self.counters.add(message.guild.id, "messages")
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.counters.track(guild.id)
+        # Новий сервер отримує нульові вікна на найближчому flush
+        self._counters_minute = None
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.counters.forget(guild.id)
+
     @commands.Cog.listener()
     async def on_member_ban(self, guild, user):
-        await db.site_stats.update_one(
-            {"_id": str(guild.id)},
-            {"$inc": {"mod_actions_24h": 1}},
-            upsert=True
-        )
+        self.counters.add(guild.id, "mod_actions")
 
     @commands.Cog.listener()
     async def on_member_unban(self, guild, user):
-        await db.site_stats.update_one(
-            {"_id": str(guild.id)},
-            {"$inc": {"mod_actions_24h": 1}},
-            upsert=True
-        )
+        self.counters.add(guild.id, "mod_actions")
 
 async def setup(bot):
     await bot.add_cog(BotStats(bot))
\ No newline at end of file
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from modules.http import fetch_bytes
+from modules.logger import Logger
+
+log = Logger("Assets")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join(ROOT_DIR, ".cache", "assets"))
+ASSET_CACHE_MAX_MB = int(os.getenv("ASSET_CACHE_MAX_MB", "200"))
+ASSET_MEMORY_MAX_MB = int(os.getenv("ASSET_MEMORY_MAX_MB", "16"))
+
+def asset_key(url: str) -> str:
+    """Ключ за хешем ассета Discord: /avatars/<id>/<hash>.png?size=64 -> avatars_<hash>_64.png"""
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split("/") if segment]
+    if not segments:
+        return hashlib.sha1(url.encode()).hexdigest()
+    stem, _, extension = segments[-1].partition(".")
+    size = parse_qs(parts.query).get("size", ["orig"])[0]
+    key = f"{segments[0]}_{stem}_{size}.{extension or 'bin'}"
+    # Лише безпечні для імені файлу символи
+    return "".join(char if char.isalnum() or char in "._-" else "_" for char in key)
+
+class AssetCache:
+    """Кеш аватарів та іконок: гарячий рівень у пам'яті + LRU на диску з обмеженням розміру"""
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR, max_disk_bytes: int = ASSET_CACHE_MAX_MB * 1024 * 1024,
+                 max_memory_bytes: int = ASSET_MEMORY_MAX_MB * 1024 * 1024, fetch=fetch_bytes):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.fetch = fetch
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = None  # key -> розмір файлу, від найстаршого до найновішого
+        self._disk_bytes = 0
+        # Дисковий рівень працює в потоках asyncio.to_thread - облік _disk лише під цим lock
+        self._disk_lock = threading.Lock()
+        self._inflight = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / total, 3) if total else 0.0,
+            "memory_mb": round(self._memory_bytes / 1024 / 1024, 2),
+            "disk_mb": round(self._disk_bytes / 1024 / 1024, 2)
+        }
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _load_index(self):
+        """Індекс диска з часом зміни файлів як порядком LRU"""
+        with self._disk_lock:
+            if self._disk is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+            self._disk = OrderedDict((name, size) for _, name, size in sorted(entries))
+            self._disk_bytes = sum(self._disk.values())
+
+    def _remember(self, key, data):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key):
+        with self._disk_lock:
+            if key not in self._disk:
+                return None
+        try:
+            with open(self._path(key), "rb") as file:
+                data = file.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._disk_lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+        with self._disk_lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return data
+
+    def _write_disk(self, key, data):
+        # Окремий тимчасовий файл на потік: два записи одного ключа не пишуть в один .tmp
+        temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+
+        evicted = []
+        with self._disk_lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    async def get(self, url: str):
+        """Байти ассета або None; одночасні запити одного ассета чекають одне завантаження"""
+        if not url:
+            return None
+        key = asset_key(url)
+
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return data
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = asyncio.ensure_future(self._load(key, url))
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def _load(self, key, url):
+        if self._disk is None:
+            await asyncio.to_thread(self._load_index)
+
+        data = await asyncio.to_thread(self._read_disk, key)
+        if data is not None:
+            self.disk_hits += 1
+            self._remember(key, data)
+            return data
+
+        self.misses += 1
+        data = await self.fetch(url)
+        if data is None:
+            self.failures += 1
+            return None
+        self._remember(key, data)
+        try:
+            await asyncio.to_thread(self._write_disk, key, data)
+        except OSError as e:
+            log.warning(f"Failed to write {key} to disk cache: {e}")
+        return data
+
+    async def get_many(self, urls: list, concurrency: int = 8) -> list:
+        """Паралельно, з обмеженням одночасних завантажень"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get(url):
+            async with semaphore:
+                return await self.get(url)
+
+        return await asyncio.gather(*(get(url) for url in urls))
+
+asset_cache = AssetCache()
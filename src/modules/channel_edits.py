@@ -0,0 +1,111 @@
+import asyncio
+import discord
+from modules.db import private_rooms
+from modules.voice_rooms import voice_rooms
+from modules.logger import Logger
+
+log = Logger("ChannelEdits")
+
+# Скільки чекати інших змін того ж каналу перед одним PATCH
+EDIT_DEBOUNCE = 1.5
+
+class _PendingEdit:
+    __slots__ = ("channel", "room", "edit", "fields", "previous", "interactions", "task")
+
+    def __init__(self, channel, room):
+        self.channel = channel
+        self.room = room
+        self.edit = {}
+        self.fields = {}
+        self.previous = {}  # значення полів кімнати до першої зміни в цій пачці
+        self.interactions = []  # кому повідомити, якщо Discord відхилить зміни
+        self.task = None
+
+class ChannelEditQueue:
+    """Зміни кімнати з кнопок і форм накопичуються і відправляються одним channel.edit та одним update у БД"""
+
+    def __init__(self, debounce: float = EDIT_DEBOUNCE):
+        self.debounce = debounce
+        self._pending = {}  # channel_id -> _PendingEdit
+        self.queued = 0
+        self.flushed = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def overwrites(self, channel) -> dict:
+        """Поточні права каналу з урахуванням ще не відправлених змін"""
+        pending = self._pending.get(channel.id)
+        if pending and "overwrites" in pending.edit:
+            return dict(pending.edit["overwrites"])
+        return channel.overwrites
+
+    def queue(self, channel, room: dict, edit: dict, fields: dict = None, interaction=None):
+        """edit - аргументи channel.edit (name, user_limit, overwrites), fields - поля кімнати для БД,
+        interaction - отримає follow-up, якщо зміни не вдасться застосувати"""
+        pending = self._pending.get(channel.id)
+        if pending is None:
+            pending = self._pending[channel.id] = _PendingEdit(channel, room)
+            pending.task = asyncio.create_task(self._flush_later(channel.id))
+        pending.edit.update(edit)
+        if interaction is not None:
+            pending.interactions.append(interaction)
+        if fields:
+            for field in fields:
+                pending.previous.setdefault(field, room.get(field))
+            pending.fields.update(fields)
+            # Реєстр оновлюється одразу, щоб наступні кнопки бачили новий стан
+            voice_rooms.apply(room, fields)
+        self.queued += 1
+
+    async def _flush_later(self, channel_id: int):
+        await asyncio.sleep(self.debounce)
+        await self._flush(channel_id)
+
+    async def _flush(self, channel_id: int):
+        pending = self._pending.pop(channel_id, None)
+        if pending is None:
+            return
+        self.flushed += 1
+
+        try:
+            await pending.channel.edit(**pending.edit)
+        except discord.NotFound:
+            return
+        except discord.HTTPException as e:
+            log.warning(f"Failed to edit room {channel_id}: {e}")
+            await self._rollback(channel_id, pending)
+            return
+
+        if pending.fields:
+            try:
+                await private_rooms.update(pending.room["_id"], pending.fields)
+            except Exception as e:
+                log.error(f"Failed to save room {channel_id}: {e}")
+
+    async def _rollback(self, channel_id: int, pending: _PendingEdit):
+        """Канал не змінився - повертаємо реєстр до попереднього стану і не пишемо в БД"""
+        if pending.previous and await voice_rooms.get_by_channel(channel_id) is pending.room:
+            voice_rooms.apply(pending.room, pending.previous)
+        for interaction in pending.interactions:
+            try:
+                await interaction.followup.send("❌ Discord не прийняв зміни кімнати, їх скасовано. Спробуй ще раз.", ephemeral=True)
+            except discord.HTTPException:
+                pass
+
+    async def flush(self):
+        """Відправити все, що чекає (при вивантаженні кога)"""
+        for pending in list(self._pending.values()):
+            pending.task.cancel()
+        await asyncio.gather(*(self._flush(channel_id) for channel_id in list(self._pending)), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "queued": self.queued,
+            "patches": self.flushed,
+            "merged": self.queued - self.flushed - self.depth
+        }
+
+channel_edits = ChannelEditQueue()
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import io
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from modules.logger import Logger
+
+log = Logger("Charts")
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_CACHE_SIZE = int(os.getenv("CHART_CACHE_SIZE", "256"))
+
+def _render_history_chart(labels, values) -> bytes:
+    """Малює графік активності (виконується в потоці пулу)"""
+    # Об'єктний API з власним Agg-полотном: без глобального стану pyplot, безпечно з потоків
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 4))
+    FigureCanvasAgg(figure)
+    ax = figure.subplots()
+    ax.plot(labels, values, marker='o', linestyle='-', color='royalblue')
+    ax.set_title('Активність (XP за останні 7 днів)')
+    ax.set_xlabel('День тижня')
+    ax.set_ylabel('Отримано XP')
+    ax.grid(True, color='darkgray')
+    figure.tight_layout()
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+class ChartRenderer:
+    """Рендер графіків в обмеженому пулі потоків з LRU-кешем готових PNG"""
+
+    def __init__(self, workers: int = CHART_WORKERS, cache_size: int = CHART_CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._pool = None
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.render_time = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            # Окремий пул, щоб графіки не займали потоки asyncio.to_thread (диск, картки)
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="charts")
+        return self._pool
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def avg_render_ms(self) -> float:
+        return self.render_time / self.misses * 1000 if self.misses else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hit_ratio, 3),
+            "avg_render_ms": round(self.avg_render_ms, 1),
+            "cached": len(self._cache)
+        }
+
+    async def history_chart(self, guild_id: int, user_id: int, day: int, labels: list, values: list) -> bytes:
+        digest = hashlib.sha1(repr((labels, values)).encode()).hexdigest()[:16]
+        key = (guild_id, user_id, day, digest)
+
+        image = self._cache.get(key)
+        if image is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return image
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(self._get_pool(), _render_history_chart, labels, values)
+        self.render_time += time.perf_counter() - started
+        self.misses += 1
+
+        self._cache[key] = image
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        log.debug(f"Chart rendered in {(time.perf_counter() - started) * 1000:.0f} ms, stats: {self.stats()}")
+        return image
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+charts = ChartRenderer()
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+import discord
+from modules.logger import Logger
+
+log = Logger("Commands")
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FINGERPRINT_FILE = os.path.join(ROOT_DIR, ".cache", "command_tree.json")
+
+# auto - глобальний sync лише при зміні дерева, guild - миттєво на сервер з config.json (для розробки), force - завжди
+SYNC_MODE = os.getenv("SYNC_COMMANDS", "auto").lower()
+
+def tree_fingerprint(tree, guild: discord.abc.Snowflake = None) -> str:
+    """Хеш серіалізованого дерева команд у тому вигляді, в якому його отримує Discord"""
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # Старіші discord.py: to_dict() без дерева
+            payload.append(command.to_dict())
+    payload.sort(key=lambda item: (item.get("type", 1), item["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _load_fingerprints() -> dict:
+    try:
+        with open(FINGERPRINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_fingerprints(fingerprints: dict):
+    os.makedirs(os.path.dirname(FINGERPRINT_FILE), exist_ok=True)
+    temp_path = FINGERPRINT_FILE + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=2)
+    os.replace(temp_path, FINGERPRINT_FILE)
+
+async def sync_commands(bot, guild_id: int = None, mode: str = SYNC_MODE) -> bool:
+    """Синхронізувати слеш-команди, якщо дерево змінилося з минулого sync; True - якщо sync був"""
+    guild = None
+    if mode == "guild":
+        if not guild_id:
+            log.warning("SYNC_COMMANDS=guild, but config.json has no guild - syncing globally")
+        else:
+            guild = discord.Object(id=guild_id)
+            bot.tree.copy_global_to(guild=guild)
+
+    key = f"{bot.application_id}:{guild.id if guild else 'global'}"
+    fingerprint = tree_fingerprint(bot.tree, guild)
+    fingerprints = _load_fingerprints()
+    if mode != "force" and fingerprints.get(key) == fingerprint:
+        log.info(f"Command tree unchanged, skipping sync ({key})")
+        return False
+
+    synced = await bot.tree.sync(guild=guild)
+    fingerprints[key] = fingerprint
+    try:
+        _save_fingerprints(fingerprints)
+    except OSError as e:
+        log.warning(f"Failed to store command tree fingerprint: {e}")
+    log.info(f"Synced {len(synced)} slash commands {'to guild ' + str(guild.id) if guild else 'globally'}")
+    return True
@@ -1,13 +1,295 @@
 import os
+from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 from dotenv import load_dotenv
+from modules.xp import add_activity, build_fields_update
+from modules.ranking import ranking
+from modules.logger import Logger
 
 load_dotenv("../.env")
+log = Logger("DB")
+
+DATABASE_NAME = "discord_bot"
+
+# Один клієнт (і один пул з'єднань) на весь процес
+_client = None
+
+def get_client() -> AsyncIOMotorClient:
+    global _client
+    if _client is None:
+        mongo_url = os.getenv("MONGO_DB")
+        if not mongo_url:
+            raise ValueError("MONGO_DB not found in .env file")
+
+        _client = AsyncIOMotorClient(
+            mongo_url,
+            maxPoolSize=int(os.getenv("MONGO_POOL_SIZE", "20")),
+            minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+            compressors=os.getenv("MONGO_COMPRESSORS", "zlib"),
+            serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+        )
+    return _client
 
 def get_database():
-    mongo_url = os.getenv("MONGO_DB")
-    if not mongo_url:
-        raise ValueError("MONGO_DB not found in .env file")
-    
-    client = AsyncIOMotorClient(mongo_url)
-    return client.discord_bot
\ No newline at end of file
+    return get_client()[DATABASE_NAME]
+
+# Індекси та "гарячі" запити, які оголошують коги при завантаженні
+# (словники, щоб перезавантаження розширення не дублювало записи)
+_indexes = {}  # (collection_name, keys) -> options
+_hot_queries = {}  # (collection_name, repr(filter), sort) -> filter
+
+def register_index(collection_name: str, keys: list, **options):
+    _indexes[(collection_name, tuple(keys))] = options
+
+def register_hot_query(collection_name: str, query: dict, sort: list = None):
+    _hot_queries[(collection_name, repr(query), tuple(sort or ()))] = query
+
+async def ensure_indexes():
+    """Створює всі зареєстровані індекси (повторний виклик нічого не змінює)"""
+    db = get_database()
+    created = 0
+    for (collection_name, keys), options in _indexes.items():
+        try:
+            await db[collection_name].create_index(list(keys), **options)
+            created += 1
+        except Exception as e:
+            log.error(f"Failed to create index {keys} on {collection_name}: {e}")
+    log.info(f"Indexes ensured: {created}/{len(_indexes)}")
+
+def _has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_has_collscan(value) for value in plan)
+    return False
+
+async def audit_queries() -> list:
+    """[DEV] explain() для гарячих запитів, повертає ті, що роблять COLLSCAN"""
+    db = get_database()
+    flagged = []
+    for (collection_name, _, sort), query in _hot_queries.items():
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(list(sort))
+        plan = await cursor.explain()
+        if _has_collscan(plan.get("queryPlanner", {}).get("winningPlan", {})):
+            flagged.append((collection_name, query, sort))
+            log.warning(f"COLLSCAN: {collection_name}.find({query}) sort={sort}")
+    log.info(f"Query audit: {len(flagged)}/{len(_hot_queries)} hot queries without index")
+    return flagged
+
+class Repository:
+    collection_name: str = ""
+
+    @property
+    def collection(self):
+        return get_database()[self.collection_name]
+
+    async def bulk_write(self, ops, ordered: bool = False):
+        return await self.collection.bulk_write(ops, ordered=ordered)
+
+class UsersRepository(Repository):
+    collection_name = "users"
+
+    @staticmethod
+    def defaults(guild_id: int, user_id: int) -> dict:
+        return {
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "xp": 0,
+            "level": 1,
+            "messages": 0,
+            "voice_minutes": 0,
+            "reactions": 0,
+            "hist": {}
+        }
+
+    async def get(self, guild_id: int, user_id: int) -> dict:
+        """Документ користувача або значення за замовчуванням (без вставки)"""
+        user = await self.collection.find_one({"guild_id": guild_id, "user_id": user_id})
+        return user or self.defaults(guild_id, user_id)
+
+    async def add_activity(self, guild_id: int, user_id: int, **kwargs) -> dict:
+        user = await add_activity(self.collection, guild_id, user_id, **kwargs)
+        ranking.update_from_document(user)
+        return user
+
+    async def set_fields(self, guild_id: int, user_id: int, data: dict) -> dict:
+        user = await self.collection.find_one_and_update(
+            {"guild_id": guild_id, "user_id": user_id},
+            build_fields_update(data),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        ranking.update_from_document(user)
+        return user
+
+    async def list_guild(self, guild_id: int, limit: Optional[int] = None) -> list:
+        return await self.collection.find({"guild_id": guild_id}).to_list(limit)
+
+    async def top(self, guild_id: int, limit: int, projection: dict = None, accept=None) -> list:
+        """Топ за score через індекс (guild_id, score); accept - фільтр, напр. чи є учасник на сервері"""
+        cursor = self.collection.find({"guild_id": guild_id}, projection).sort("score", -1).batch_size(limit * 2)
+        result = []
+        try:
+            async for user in cursor:
+                if accept is None or accept(user):
+                    result.append(user)
+                    if len(result) >= limit:
+                        break
+        finally:
+            await cursor.close()
+        return result
+
+    async def page(self, guild_id: int, limit: int, projection: dict = None, after: tuple = None,
+                   before: tuple = None, from_end: bool = False, skip: int = 0) -> list:
+        """Keyset-сторінка за (score спадає, user_id зростає); after/before - межа (score, user_id)"""
+        query = {"guild_id": guild_id}
+        if after is not None:
+            score, user_id = after
+            query["$or"] = [{"score": {"$lt": score}}, {"score": score, "user_id": {"$gt": user_id}}]
+        elif before is not None:
+            score, user_id = before
+            query["$or"] = [{"score": {"$gt": score}}, {"score": score, "user_id": {"$lt": user_id}}]
+
+        # Назад (до межі або з кінця) читаємо у зворотному порядку і розвертаємо
+        backwards = before is not None or from_end
+        sort = [("score", 1), ("user_id", -1)] if backwards else [("score", -1), ("user_id", 1)]
+        cursor = self.collection.find(query, projection).sort(sort).skip(skip).limit(limit)
+        users = await cursor.to_list(limit)
+        return users[::-1] if backwards else users
+
+    async def count(self, guild_id: int) -> int:
+        return await self.collection.count_documents({"guild_id": guild_id})
+
+    async def rank(self, guild_id: int, score: int) -> int:
+        """Позиція в рейтингу: кількість користувачів з більшим score + 1"""
+        return await self.collection.count_documents({"guild_id": guild_id, "score": {"$gt": score}}) + 1
+
+class PrivateRoomsRepository(Repository):
+    collection_name = "private_rooms"
+
+    async def list_active(self) -> list:
+        return await self.collection.find({"active": True}).to_list(None)
+
+    def iter_active(self, guild_id: int):
+        return self.collection.find({"guild_id": guild_id, "active": True}, {"channel_id": 1, "owner_id": 1})
+
+    async def get_active_by_owner(self, owner_id: int) -> Optional[dict]:
+        return await self.collection.find_one({"owner_id": owner_id, "active": True})
+
+    async def get_active_by_channel(self, channel_id: int) -> Optional[dict]:
+        return await self.collection.find_one({"channel_id": channel_id, "active": True})
+
+    async def create(self, room: dict):
+        await self.collection.insert_one(room)
+
+    async def update(self, room_id, data: dict):
+        await self.collection.update_one({"_id": room_id}, {"$set": data})
+
+    async def update_active_by_owner(self, owner_id: int, data: dict):
+        await self.collection.update_one({"owner_id": owner_id, "active": True}, {"$set": data})
+
+    async def deactivate(self, room_id, deleted_at):
+        await self.collection.update_one(
+            {"_id": room_id},
+            {"$set": {"active": False, "deleted_at": deleted_at}}
+        )
+
+    async def deactivate_many(self, room_ids: list, deleted_at):
+        if room_ids:
+            await self.bulk_write([
+                UpdateOne({"_id": room_id}, {"$set": {"active": False, "deleted_at": deleted_at}})
+                for room_id in room_ids
+            ])
+
+class ServerConfigsRepository(Repository):
+    collection_name = "server_configs"
+
+    async def get(self, guild_id: int) -> Optional[dict]:
+        return await self.collection.find_one({"guild_id": guild_id})
+
+    async def list_configured(self) -> list:
+        return await self.collection.find({"creator_channel_id": {"$exists": True}}).to_list(None)
+
+    async def update(self, guild_id: int, data: dict):
+        await self.collection.update_one({"guild_id": guild_id}, {"$set": data}, upsert=True)
+
+class TicketConfigRepository(Repository):
+    collection_name = "ticket_config"
+
+    async def get(self, guild_id: int) -> dict:
+        return await self.collection.find_one({"_id": guild_id}) or {}
+
+    async def update(self, guild_id: int, data: dict):
+        await self.collection.update_one({"_id": guild_id}, {"$set": data}, upsert=True)
+
+    async def delete(self, guild_id: int):
+        await self.collection.delete_one({"_id": guild_id})
+
+class TicketsRepository(Repository):
+    collection_name = "tickets"
+
+    async def list_open(self) -> list:
+        return await self.collection.find({"state": "open"}, {"guild_id": 1, "opener_id": 1, "channel_id": 1}).to_list(None)
+
+    async def get_open(self, guild_id: int, opener_id: int) -> Optional[dict]:
+        return await self.collection.find_one({"guild_id": guild_id, "opener_id": opener_id, "state": "open"})
+
+    async def open(self, guild_id: int, opener_id: int, channel_id: int, opened_at):
+        await self.collection.insert_one({
+            "guild_id": guild_id,
+            "opener_id": opener_id,
+            "channel_id": channel_id,
+            "state": "open",
+            "opened_at": opened_at
+        })
+
+    async def close(self, channel_id: int, closed_at):
+        await self.collection.update_one(
+            {"channel_id": channel_id, "state": "open"},
+            {"$set": {"state": "closed", "closed_at": closed_at}}
+        )
+
+class GuildsRepository(Repository):
+    collection_name = "guilds"
+
+    async def get(self, guild_id: int) -> Optional[dict]:
+        return await self.collection.find_one({"guild_id": guild_id})
+
+    async def list_configured(self) -> list:
+        return await self.collection.find({"creator_channel_id": {"$exists": True}}).to_list(None)
+
+    async def update(self, guild_id: int, data: dict):
+        await self.collection.update_one({"guild_id": guild_id}, {"$set": data}, upsert=True)
+
+class SiteStatsRepository(Repository):
+    collection_name = "site_stats"
+
+    async def set(self, doc_id: str, data: dict):
+        await self.collection.update_one({"_id": doc_id}, {"$set": data}, upsert=True)
+
+    async def increment(self, doc_id: str, data: dict):
+        await self.collection.update_one({"_id": doc_id}, {"$inc": data}, upsert=True)
+
+    @staticmethod
+    def set_ops(docs: dict) -> list:
+        return [UpdateOne({"_id": doc_id}, {"$set": data}, upsert=True) for doc_id, data in docs.items()]
+
+    async def set_many(self, docs: dict):
+        """Один bulk_write для {doc_id: data}"""
+        if docs:
+            await self.bulk_write(self.set_ops(docs))
+
+users = UsersRepository()
+private_rooms = PrivateRoomsRepository()
+server_configs = ServerConfigsRepository()
+ticket_config = TicketConfigRepository()
+tickets = TicketsRepository()
+guilds = GuildsRepository()
+site_stats = SiteStatsRepository()
@@ -0,0 +1,27 @@
+import asyncio
+import aiohttp
+
+# Одна HTTP-сесія (і один пул з'єднань) на весь процес
+_session = None
+
+def get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def fetch_bytes(url: str):
+    """Завантажити файл, None якщо не вдалося"""
+    try:
+        async with get_session().get(url) as response:
+            if response.status != 200:
+                return None
+            return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from modules.rank_card import FONTS_DIR, BACKGROUND, PANEL, ACCENT, TEXT, MUTED
+
+WIDTH = 800
+HEADER = 80
+ROW_HEIGHT = 64
+AVATAR_SIZE = 48
+MEDALS = [(255, 204, 77, 255), (192, 198, 206, 255), (205, 127, 50, 255)]
+
+class LeaderboardCardRenderer:
+    """Лідерборд картинкою: шрифти і маска аватара готуються один раз, готові PNG кешуються по серверу"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._cache = {}  # guild_id -> (digest, png)
+        self._pending = {}  # (guild_id, digest) -> задача рендеру, щоб серія запитів малювала один раз
+
+    def _prepare(self):
+        with self._lock:
+            if self._ready:
+                return
+            from PIL import Image, ImageDraw, ImageFont
+            self.font_title = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans-Bold.ttf"), 30)
+            self.font_name = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans-Bold.ttf"), 22)
+            self.font_text = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans.ttf"), 18)
+            self.avatar_mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+            ImageDraw.Draw(self.avatar_mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+            self.avatar_placeholder = Image.new("RGBA", (AVATAR_SIZE, AVATAR_SIZE), MUTED)
+            self._ready = True
+
+    @staticmethod
+    def digest(title: str, rows: list) -> str:
+        """Відбиток того, що буде на картинці"""
+        return hashlib.sha1(repr((title, rows)).encode()).hexdigest()
+
+    async def build(self, guild_id: int, title: str, rows: list, fetch_avatars) -> bytes:
+        """Картинка з кешу, якщо рейтинг не змінився; інакше - завантажити аватари і намалювати поза циклом подій"""
+        digest = self.digest(title, rows)
+        cached = self._cache.get(guild_id)
+        if cached and cached[0] == digest:
+            return cached[1]
+
+        key = (guild_id, digest)
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.ensure_future(self._build(guild_id, digest, title, rows, fetch_avatars))
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _build(self, guild_id, digest, title, rows, fetch_avatars):
+        avatars = await fetch_avatars([row[4] for row in rows])
+        image = await asyncio.to_thread(self.render, title, rows, avatars)
+        self._cache[guild_id] = (digest, image)
+        return image
+
+    def _fit_text(self, text, font, width):
+        while len(text) > 1 and font.getlength(text) > width:
+            text = text[:-2] + "…"
+        return text
+
+    def render(self, title: str, rows: list, avatars: list) -> bytes:
+        """rows: [(позиція, ім'я, рівень, xp, url аватара)], avatars - байти аватарів у тому ж порядку"""
+        from PIL import Image, ImageDraw, ImageOps
+        self._prepare()
+        height = HEADER + ROW_HEIGHT * len(rows) + 20
+        card = Image.new("RGBA", (WIDTH, height), BACKGROUND)
+        draw = ImageDraw.Draw(card)
+        draw.rounded_rectangle((10, 10, WIDTH - 10, height - 10), radius=20, fill=PANEL)
+        draw.text((30, 26), self._fit_text(title, self.font_title, WIDTH - 60), font=self.font_title, fill=TEXT)
+
+        for i, ((position, name, level, xp, _), avatar) in enumerate(zip(rows, avatars)):
+            top = HEADER + i * ROW_HEIGHT
+            middle = top + ROW_HEIGHT // 2
+            color = MEDALS[position - 1] if position <= len(MEDALS) else MUTED
+            draw.text((30, middle), f"#{position}", font=self.font_name, fill=color, anchor="lm")
+
+            avatar_image = self.avatar_placeholder
+            if avatar:
+                try:
+                    avatar_image = ImageOps.fit(Image.open(io.BytesIO(avatar)).convert("RGBA"), (AVATAR_SIZE, AVATAR_SIZE))
+                except Exception:
+                    pass
+            card.paste(avatar_image, (100, middle - AVATAR_SIZE // 2), self.avatar_mask)
+
+            # Ширина тексту рахується шрифтом - кирилиця не ламає вирівнювання
+            draw.text((165, middle), self._fit_text(name, self.font_name, 350), font=self.font_name, fill=TEXT, anchor="lm")
+            draw.text((540, middle), f"Рівень {level}", font=self.font_text, fill=ACCENT, anchor="lm")
+            draw.text((WIDTH - 30, middle), f"{xp} XP", font=self.font_text, fill=MUTED, anchor="rm")
+
+        buffer = io.BytesIO()
+        card.save(buffer, format="PNG", compress_level=1)
+        return buffer.getvalue()
+
+leaderboard_cards = LeaderboardCardRenderer()
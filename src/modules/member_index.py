@@ -0,0 +1,121 @@
+import re
+from bisect import bisect_left, insort
+import discord
+
+MENTION_RE = re.compile(r"^<@!?(\d+)>$")
+# Скільки варіантів показувати, якщо ім'я неоднозначне
+MAX_CANDIDATES = 5
+
+def _names(member) -> set:
+    names = {member.name, member.display_name, getattr(member, "global_name", None)}
+    return {name.lower() for name in names if name}
+
+class GuildNameIndex:
+    """Відсортований масив (ім'я, member_id): точний і префіксний пошук за O(log n)"""
+
+    def __init__(self):
+        self._entries = []
+        self._names = {}  # member_id -> імена в індексі
+
+    def __len__(self):
+        return len(self._names)
+
+    @classmethod
+    def from_members(cls, members):
+        """Побудова всього сервера: один sort замість insort на кожне ім'я"""
+        index = cls()
+        for member in members:
+            names = index._names[member.id] = _names(member)
+            index._entries.extend((name, member.id) for name in names)
+        index._entries.sort()
+        return index
+
+    def add(self, member):
+        self.remove(member.id)
+        names = _names(member)
+        self._names[member.id] = names
+        for name in names:
+            insort(self._entries, (name, member.id))
+
+    def remove(self, member_id: int):
+        for name in self._names.pop(member_id, ()):
+            position = bisect_left(self._entries, (name, member_id))
+            if position < len(self._entries) and self._entries[position] == (name, member_id):
+                del self._entries[position]
+
+    def exact(self, name: str) -> list:
+        name = name.lower()
+        result = []
+        position = bisect_left(self._entries, (name,))
+        while position < len(self._entries) and self._entries[position][0] == name:
+            if self._entries[position][1] not in result:
+                result.append(self._entries[position][1])
+            position += 1
+        return result
+
+    def prefix(self, prefix: str, limit: int = MAX_CANDIDATES + 1) -> list:
+        prefix = prefix.lower()
+        result = []
+        position = bisect_left(self._entries, (prefix,))
+        while position < len(self._entries) and self._entries[position][0].startswith(prefix):
+            member_id = self._entries[position][1]
+            if member_id not in result:
+                result.append(member_id)
+                if len(result) >= limit:
+                    break
+            position += 1
+        return result
+
+class MemberIndex:
+    """Індекси імен учасників по серверах, оновлюються з подій учасників"""
+
+    def __init__(self):
+        self._guilds = {}
+
+    def build(self, guild):
+        self._guilds[guild.id] = GuildNameIndex.from_members(guild.members)
+
+    def drop(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+
+    def add(self, member):
+        index = self._guilds.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    def remove(self, guild_id: int, member_id: int):
+        index = self._guilds.get(guild_id)
+        if index is not None:
+            index.remove(member_id)
+
+    async def resolve(self, guild, text: str, exact: bool = False):
+        """(учасник, []) якщо знайдено однозначно, (None, [кандидати]) якщо ім'я неоднозначне, (None, []) якщо нічого.
+        exact=True - для незворотних дій: префікс ніколи не визначає учасника, лише пропонує кандидатів"""
+        text = text.strip()
+        if not text:
+            return None, []
+        match = MENTION_RE.match(text)
+        if match or text.isdigit():
+            member_id = int(match.group(1) if match else text)
+            member = guild.get_member(member_id)
+            if member is None:
+                # Учасника немає в кеші - тільки тоді йдемо в REST
+                try:
+                    member = await guild.fetch_member(member_id)
+                except discord.HTTPException:
+                    member = None
+            return member, []
+
+        index = self._guilds.get(guild.id)
+        if index is None:
+            self.build(guild)
+            index = self._guilds[guild.id]
+
+        matches = index.exact(text)
+        candidates = matches or index.prefix(text)
+        members = [member for member in map(guild.get_member, candidates) if member is not None]
+        if len(members) == 1 and (matches or not exact):
+            return members[0], []
+        return None, members[:MAX_CANDIDATES]
+
+member_index = MemberIndex()
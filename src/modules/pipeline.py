@@ -0,0 +1,159 @@
+import asyncio
+import inspect
+import time
+from pymongo.errors import BulkWriteError
+from modules.logger import Logger
+
+log = Logger("Pipeline")
+
+def failed_ops(error, start: int = 0, end: int = None):
+    """{індекс операції: код помилки} з BulkWriteError (решта операцій записана) або None, якщо результат невідомий"""
+    if not isinstance(error, BulkWriteError) or error.details.get("writeConcernErrors"):
+        return None
+    failed = {}
+    for write_error in error.details.get("writeErrors", ()):
+        index = write_error["index"]
+        if index >= start and (end is None or index < end):
+            failed[index - start] = write_error.get("code")
+    return failed
+
+class PendingWrite:
+    """Операції для одного репозиторію + що зробити після запису.
+    on_failure(failed) отримує результат failed_ops для своїх операцій"""
+
+    __slots__ = ("repository", "ops", "on_success", "on_failure")
+
+    def __init__(self, repository, ops: list, on_success=None, on_failure=None):
+        self.repository = repository
+        self.ops = ops
+        self.on_success = on_success
+        self.on_failure = on_failure
+
+class _Stage:
+    __slots__ = ("name", "handler", "order", "calls", "total_time", "max_time")
+
+    def __init__(self, name, handler, order):
+        self.name = name
+        self.handler = handler
+        self.order = order
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+class EventPipeline:
+    """Одна точка входу для подій гейтвею: стадії по черзі обробляють подію і накопичують зміни в пам'яті,
+    flush збирає їх з усіх стадій і пише одним bulk_write на колекцію"""
+
+    def __init__(self):
+        self._stages = {}  # подія -> [_Stage], відсортовані за order
+        self._sinks = {}  # назва -> функція, що повертає PendingWrite або None
+        self._counts = {}  # подія -> {"accepted": n, "dropped": {стадія: n}}
+        self._lock = asyncio.Lock()
+        self.flushes = 0
+        self.written_ops = 0
+
+    def register(self, event: str, name: str, handler, order: int = 100):
+        """handler(*args) -> False, щоб відкинути подію для наступних стадій"""
+        stages = [stage for stage in self._stages.get(event, []) if stage.name != name]
+        stages.append(_Stage(name, handler, order))
+        stages.sort(key=lambda stage: stage.order)
+        self._stages[event] = stages
+
+    def register_sink(self, name: str, collect):
+        self._sinks[name] = collect
+
+    def unregister(self, name: str):
+        """Прибрати всі стадії та sink з цією назвою (при вивантаженні кога)"""
+        for event, stages in self._stages.items():
+            self._stages[event] = [stage for stage in stages if stage.name != name]
+        self._sinks.pop(name, None)
+
+    async def dispatch(self, event: str, *args) -> bool:
+        counts = self._counts.setdefault(event, {"accepted": 0, "dropped": {}})
+        for stage in self._stages.get(event, ()):
+            started = time.perf_counter()
+            try:
+                result = stage.handler(*args)
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                log.error(f"Stage {stage.name} failed on {event}: {e}")
+                result = None
+            elapsed = time.perf_counter() - started
+            stage.calls += 1
+            stage.total_time += elapsed
+            stage.max_time = max(stage.max_time, elapsed)
+
+            if result is False:
+                counts["dropped"][stage.name] = counts["dropped"].get(stage.name, 0) + 1
+                return False
+        counts["accepted"] += 1
+        return True
+
+    async def flush(self) -> int:
+        """Зібрати зміни всіх sink-ів і записати їх: один bulk_write на репозиторій"""
+        async with self._lock:
+            writes = []
+            for name, collect in self._sinks.items():
+                try:
+                    write = collect()
+                except Exception as e:
+                    log.error(f"Sink {name} failed to collect: {e}")
+                    continue
+                if write and write.ops:
+                    writes.append(write)
+            if not writes:
+                return 0
+
+            grouped = {}
+            for write in writes:
+                grouped.setdefault(id(write.repository), []).append(write)
+
+            results = await asyncio.gather(
+                *(group[0].repository.bulk_write([op for write in group for op in write.ops]) for group in grouped.values()),
+                return_exceptions=True
+            )
+
+            written = 0
+            for group, result in zip(grouped.values(), results):
+                if isinstance(result, Exception):
+                    log.error(f"Flush to {group[0].repository.collection_name} failed: {result}")
+                offset = 0
+                for write in group:
+                    # Індекси помилок BulkWriteError - у спільному списку операцій групи
+                    failed = failed_ops(result, offset, offset + len(write.ops)) if isinstance(result, Exception) else {}
+                    offset += len(write.ops)
+                    try:
+                        if failed == {}:
+                            written += len(write.ops)
+                            if write.on_success:
+                                write.on_success()
+                        else:
+                            if failed is not None:
+                                written += len(write.ops) - len(failed)
+                            if write.on_failure:
+                                write.on_failure(failed)
+                    except Exception as e:
+                        # Помилка одного sink-а не повинна залишити інші без колбеків
+                        log.error(f"Flush callback failed for {write.repository.collection_name}: {e}")
+
+            self.flushes += 1
+            self.written_ops += written
+            return written
+
+    def stats(self) -> dict:
+        return {
+            "events": {event: {"accepted": counts["accepted"], "dropped": dict(counts["dropped"])} for event, counts in self._counts.items()},
+            "stages": {
+                f"{event}:{stage.name}": {
+                    "calls": stage.calls,
+                    "avg_us": round(stage.total_time / stage.calls * 1_000_000, 1) if stage.calls else 0.0,
+                    "max_us": round(stage.max_time * 1_000_000, 1)
+                }
+                for event, stages in self._stages.items() for stage in stages
+            },
+            "flushes": self.flushes,
+            "written_ops": self.written_ops
+        }
+
+pipeline = EventPipeline()
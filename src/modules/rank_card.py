@@ -0,0 +1,138 @@
+import io
+import os
+import threading
+
+FONTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "assets", "fonts")
+
+CARD_SIZE = (900, 280)
+AVATAR_SIZE = 180
+AVATAR_POS = (40, 50)
+BAR_BOX = (250, 200, 860, 232)
+SPARK_BOX = (600, 112, 860, 182)
+
+BACKGROUND = (43, 45, 49, 255)
+PANEL = (30, 31, 34, 255)
+ACCENT = (124, 124, 240, 255)
+TEXT = (242, 243, 245, 255)
+MUTED = (148, 155, 164, 255)
+
+class RankCardRenderer:
+    """Картка профілю на Pillow: шрифти, фон і маска аватара готуються один раз"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+        self._local = threading.local()
+
+    def _prepare(self):
+        with self._lock:
+            if self._ready:
+                return
+            # Pillow імпортується при першому рендері, а не при завантаженні кога
+            from PIL import Image, ImageDraw, ImageFont
+            self.font_name = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans-Bold.ttf"), 36)
+            self.font_value = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans-Bold.ttf"), 24)
+            self.font_label = ImageFont.truetype(os.path.join(FONTS_DIR, "DejaVuSans.ttf"), 18)
+
+            # Статичний шаблон: фон, панель, порожня смуга прогресу, рамка під аватар і підписи
+            template = Image.new("RGBA", CARD_SIZE, BACKGROUND)
+            draw = ImageDraw.Draw(template)
+            draw.rounded_rectangle((16, 16, CARD_SIZE[0] - 16, CARD_SIZE[1] - 16), radius=24, fill=PANEL)
+            draw.rounded_rectangle(BAR_BOX, radius=16, fill=BACKGROUND)
+            x, y = AVATAR_POS
+            draw.ellipse((x - 4, y - 4, x + AVATAR_SIZE + 4, y + AVATAR_SIZE + 4), fill=ACCENT)
+            draw.text((SPARK_BOX[0], SPARK_BOX[1] - 26), "Активність", font=self.font_label, fill=MUTED)
+            self.template = template
+
+            self.avatar_mask = Image.new("L", (AVATAR_SIZE, AVATAR_SIZE), 0)
+            ImageDraw.Draw(self.avatar_mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+            self.avatar_placeholder = Image.new("RGBA", (AVATAR_SIZE, AVATAR_SIZE), MUTED)
+            self._ready = True
+
+    def _buffer(self):
+        # Один BytesIO на потік, перевикористовується між рендерами
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        return buffer
+
+    def _draw_sparkline(self, draw, values):
+        left, top, right, bottom = SPARK_BOX
+        if len(values) < 2:
+            return
+        peak = max(values) or 1
+        step = (right - left) / (len(values) - 1)
+        points = [
+            (left + i * step, bottom - (value / peak) * (bottom - top))
+            for i, value in enumerate(values)
+        ]
+        draw.line(points, fill=ACCENT, width=3, joint="curve")
+        for x, y in points:
+            draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=TEXT)
+
+    def render(self, name: str, level: int, xp: int, xp_needed: int, history: list, avatar: bytes = None) -> bytes:
+        """Намалювати картку і повернути PNG"""
+        from PIL import Image, ImageDraw, ImageOps
+        self._prepare()
+        card = self.template.copy()
+        draw = ImageDraw.Draw(card)
+
+        avatar_image = self.avatar_placeholder
+        if avatar:
+            # Биті або не-зображення (наприклад, HTML помилки CDN) - лишаємо заглушку
+            try:
+                avatar_image = ImageOps.fit(Image.open(io.BytesIO(avatar)).convert("RGBA"), (AVATAR_SIZE, AVATAR_SIZE))
+            except Exception:
+                pass
+        card.paste(avatar_image, AVATAR_POS, self.avatar_mask)
+
+        # Обрізаємо ім'я по ширині, а не по кількості символів
+        while len(name) > 1 and self.font_name.getlength(name) > CARD_SIZE[0] - 300:
+            name = name[:-2] + "…"
+        draw.text((250, 40), name, font=self.font_name, fill=TEXT)
+        draw.text((250, 100), "Рівень", font=self.font_label, fill=MUTED)
+        draw.text((250, 124), str(level), font=self.font_value, fill=TEXT)
+        draw.text((380, 100), "XP", font=self.font_label, fill=MUTED)
+        draw.text((380, 124), f"{xp} / {xp_needed}", font=self.font_value, fill=TEXT)
+
+        left, top, right, bottom = BAR_BOX
+        progress = min(max(xp / xp_needed, 0), 1) if xp_needed else 0
+        if progress > 0:
+            draw.rounded_rectangle((left, top, left + max(int((right - left) * progress), bottom - top), bottom), radius=16, fill=ACCENT)
+
+        self._draw_sparkline(draw, history)
+
+        buffer = self._buffer()
+        card.save(buffer, format="PNG", optimize=False, compress_level=1)
+        return buffer.getvalue()
+
+rank_cards = RankCardRenderer()
+
+def _benchmark(iterations: int = 50):
+    """Порівняння з matplotlib-графіком: python -m modules.rank_card (з папки src)"""
+    import time
+    from PIL import Image
+    from modules.charts import _render_history_chart
+
+    history = [120, 40, 0, 310, 95, 60, 200, 10, 0, 75, 130, 90, 20, 300]
+    labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    avatar = io.BytesIO()
+    Image.new("RGB", (256, 256), (200, 120, 80)).save(avatar, format="PNG")
+
+    def measure(func):
+        func()  # прогрів: шрифти, шаблон, імпорт matplotlib
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations * 1000
+
+    pillow_ms = measure(lambda: rank_cards.render("Тестовий користувач", 12, 540, 1420, history, avatar.getvalue()))
+    matplotlib_ms = measure(lambda: _render_history_chart(labels, history[-7:]))
+    print(f"Pillow rank card: {pillow_ms:.1f} ms/render")
+    print(f"matplotlib chart: {matplotlib_ms:.1f} ms/render")
+    print(f"Speedup: x{matplotlib_ms / pillow_ms:.1f}")
+
+if __name__ == "__main__":
+    _benchmark()
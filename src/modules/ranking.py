@@ -0,0 +1,341 @@
+import random
+from modules.xp import LEVEL_SCORE, roll_levels
+from modules.logger import Logger
+
+log = Logger("Ranking")
+
+class _Nil:
+    """Кінець списку на кожному рівні"""
+    key = None
+
+_NIL = _Nil()
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [_NIL] * levels
+        self.width = [1] * levels
+
+class IndexableSkipList:
+    """Відсортований skip list з ширинами посилань: вставка, видалення, rank і доступ за індексом за O(log n)"""
+
+    MAX_LEVELS = 24
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVELS)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_levels(self):
+        levels = 1
+        while levels < self.MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVELS
+        steps_at_level = [0] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not _NIL and node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_levels()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new_node.next[level] = prev.next[level]
+            prev.next[level] = new_node
+            new_node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVELS
+        node = self.head
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not _NIL and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """0-based позиція ключа"""
+        node = self.head
+        position = 0
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not _NIL and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        target = node.next[0]
+        if target is _NIL or target.key != key:
+            raise KeyError(key)
+        return position
+
+    def _node_at(self, index):
+        node = self.head
+        remaining = index + 1
+        for level in reversed(range(self.MAX_LEVELS)):
+            while node.next[level] is not _NIL and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def iter_from(self, index: int = 0):
+        if index >= self.size:
+            return
+        node = self._node_at(max(index, 0))
+        while node is not _NIL:
+            yield node.key
+            node = node.next[0]
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+class GuildRanking:
+    """Рейтинг одного сервера: порядок за score + статистика для відображення"""
+
+    def __init__(self):
+        self._list = IndexableSkipList()
+        self._users = {}
+
+    def __len__(self):
+        return len(self._list)
+
+    @staticmethod
+    def _key(user_id, entry):
+        # Від більшого score до меншого, при рівності - стабільно за user_id
+        return (-(entry["xp"] + entry["level"] * LEVEL_SCORE), user_id)
+
+    def get(self, user_id):
+        return self._users.get(user_id)
+
+    def set(self, user_id, **stats):
+        """Встановити абсолютні значення (після читання з БД)"""
+        entry = self._users.get(user_id)
+        if entry is None:
+            entry = self._users[user_id] = {"xp": 0, "level": 1, "messages": 0, "voice_minutes": 0, "reactions": 0}
+        else:
+            self._list.remove(self._key(user_id, entry))
+        entry.update({field: value for field, value in stats.items() if field in entry})
+        self._list.insert(self._key(user_id, entry))
+
+    def apply(self, user_id, xp=0, messages=0, reactions=0, voice_minutes=0):
+        """Та сама зміна, що й build_activity_update, але в пам'яті"""
+        entry = self._users.get(user_id) or {"xp": 0, "level": 1, "messages": 0, "voice_minutes": 0, "reactions": 0}
+        new_xp, new_level = roll_levels(max(0, entry["xp"] + xp), entry["level"])
+        self.set(
+            user_id,
+            xp=new_xp,
+            level=new_level,
+            messages=entry["messages"] + messages,
+            reactions=entry["reactions"] + reactions,
+            voice_minutes=entry["voice_minutes"] + voice_minutes
+        )
+
+    def remove(self, user_id):
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            self._list.remove(self._key(user_id, entry))
+
+    def position(self, user_id):
+        """1-based позиція або None"""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        return self._list.index(self._key(user_id, entry)) + 1
+
+    def iter_from(self, offset: int = 0):
+        """(позиція, user_id, статистика) починаючи з offset"""
+        for position, (_, user_id) in enumerate(self._list.iter_from(offset), start=offset + 1):
+            yield position, user_id, self._users[user_id]
+
+    def top(self, limit: int, offset: int = 0):
+        result = []
+        for item in self.iter_from(offset):
+            if len(result) >= limit:
+                break
+            result.append(item)
+        return result
+
+    def around(self, user_id, radius: int = 2):
+        """Сусіди користувача в рейтингу (включно з ним)"""
+        position = self.position(user_id)
+        if position is None:
+            return []
+        start = max(position - 1 - radius, 0)
+        return self.top(position - start + radius, start)
+
+class RankingIndex:
+    """Рейтинги всіх серверів у пам'яті, будуються один раз із колекції users"""
+
+    PROJECTION = {"guild_id": 1, "user_id": 1, "xp": 1, "level": 1, "messages": 1, "voice_minutes": 1, "reactions": 1, "flushes": 1}
+
+    def __init__(self):
+        self._guilds = {}
+        self._loads = []  # активні load(): зміни, що прийшли під час читання колекції
+
+    def is_loaded(self, guild_id: int) -> bool:
+        return guild_id in self._guilds
+
+    def get(self, guild_id: int):
+        return self._guilds.get(guild_id)
+
+    def _loads_for(self, guild_id: int):
+        return [load for load in self._loads if load["guild_id"] in (None, guild_id)]
+
+    @staticmethod
+    def _read(guilds, tokens, user):
+        guilds.setdefault(user["guild_id"], GuildRanking()).set(
+            user["user_id"],
+            **{field: value for field, value in user.items() if field not in ("_id", "guild_id", "user_id", "flushes")}
+        )
+        tokens[(user["guild_id"], user["user_id"])] = set(user.get("flushes") or ())
+
+    async def load(self, repository, guild_id: int = None):
+        """Побудувати рейтинг з БД (всі сервери або один)"""
+        query = {} if guild_id is None else {"guild_id": guild_id}
+        state = {"guild_id": guild_id, "deltas": {}, "documents": set()}
+        self._loads.append(state)
+        try:
+            guilds = {}
+            tokens = {}  # (guild_id, user_id) -> токени flush, які вже є в прочитаному документі
+            async for user in repository.collection.find(query, self.PROJECTION):
+                self._read(guilds, tokens, user)
+
+            # Користувачів, яких під час читання змінили напряму (set_fields, add_activity), перечитуємо
+            documents = {}
+            for key in state["documents"]:
+                documents.setdefault(key[0], []).append(key[1])
+            for document_guild, user_ids in documents.items():
+                async for user in repository.collection.find({"guild_id": document_guild, "user_id": {"$in": user_ids}}, self.PROJECTION):
+                    self._read(guilds, tokens, user)
+        finally:
+            self._loads.remove(state)
+
+        # Дельти, записані під час читання: документ, прочитаний пізніше, уже їх містить (його токен є в flushes),
+        # тому відтворюємо лише ті, що прийшли після останньої дельти з токеном у документі
+        replayed = 0
+        for key, deltas in state["deltas"].items():
+            seen = tokens.get(key, ())
+            start = 0
+            for position, delta in enumerate(deltas):
+                if delta.get("token") in seen:
+                    start = position + 1
+            for delta in deltas[start:]:
+                guilds.setdefault(key[0], GuildRanking()).apply(
+                    key[1],
+                    xp=delta["xp"],
+                    messages=delta["messages"],
+                    reactions=delta["reactions"],
+                    voice_minutes=delta["voice_minutes"]
+                )
+                replayed += 1
+
+        if guild_id is None:
+            self._guilds = guilds
+        else:
+            self._guilds[guild_id] = guilds.get(guild_id, GuildRanking())
+        log.info(f"Ranking loaded: {len(guilds)} guilds, {sum(len(r) for r in guilds.values())} users, {replayed} deltas replayed")
+
+    def apply_deltas(self, deltas: list):
+        """Колбек для XPAccumulator після успішного flush: [((guild_id, user_id), дельта)]"""
+        for (guild_id, user_id), delta in deltas:
+            for load in self._loads_for(guild_id):
+                load["deltas"].setdefault((guild_id, user_id), []).append(delta)
+
+            ranking = self._guilds.get(guild_id)
+            # Сервер ще не завантажено - load() прочитає вже записані дані
+            if ranking is None:
+                continue
+            ranking.apply(
+                user_id,
+                xp=delta["xp"],
+                messages=delta["messages"],
+                reactions=delta["reactions"],
+                voice_minutes=delta["voice_minutes"]
+            )
+
+    def update_from_document(self, user: dict):
+        """Оновити користувача документом, який повернула БД"""
+        if not user:
+            return
+        for load in self._loads_for(user["guild_id"]):
+            load["documents"].add((user["guild_id"], user["user_id"]))
+        if user["guild_id"] not in self._guilds:
+            return
+        self._guilds[user["guild_id"]].set(
+            user["user_id"],
+            **{field: user[field] for field in ("xp", "level", "messages", "voice_minutes", "reactions") if field in user}
+        )
+
+    async def _drift(self, repository, guild_id: int, ranking, sample: int) -> bool:
+        # 1. Топ у пам'яті проти індексованого топу в БД
+        expected = [
+            (user["user_id"], user.get("score"))
+            for user in await repository.top(guild_id, sample, {"user_id": 1, "score": 1})
+        ]
+        actual = [
+            (user_id, entry["xp"] + entry["level"] * LEVEL_SCORE)
+            for _, user_id, entry in ranking.top(sample)
+        ]
+        # На межі вибірки однаковий score може дати різних користувачів - їх не порівнюємо
+        expected_scores = [score for _, score in expected]
+        actual_scores = [score for _, score in actual]
+        boundary = min(expected_scores, default=0)
+        if expected_scores != actual_scores or \
+                {u for u, s in expected if s > boundary} != {u for u, s in actual if s > boundary}:
+            return True
+
+        # 2. Кількість користувачів сервера
+        if await repository.count(guild_id) != len(ranking):
+            return True
+
+        # 3. Випадкові позиції з усього рейтингу, а не лише з топу
+        positions = random.sample(range(len(ranking)), min(sample, len(ranking)))
+        scores = {}
+        for position in positions:
+            for _, user_id, entry in ranking.top(1, position):
+                scores[user_id] = entry["xp"] + entry["level"] * LEVEL_SCORE
+        found = 0
+        async for user in repository.collection.find({"guild_id": guild_id, "user_id": {"$in": list(scores)}}, {"user_id": 1, "score": 1}):
+            found += 1
+            if user.get("score") != scores[user["user_id"]]:
+                return True
+        return found != len(scores)
+
+    async def verify(self, repository, guild_id: int, sample: int = 20) -> bool:
+        """Звірити з БД топ, кількість і випадкові позиції рейтингу; при розбіжності - перебудувати сервер"""
+        ranking = self._guilds.get(guild_id)
+        if ranking is None:
+            return False
+        if not await self._drift(repository, guild_id, ranking, sample):
+            return True
+
+        log.warning(f"Ranking drift in guild {guild_id}, rebuilding from DB")
+        await self.load(repository, guild_id)
+        return False
+
+ranking = RankingIndex()
@@ -0,0 +1,133 @@
+import time
+from array import array
+
+MINUTES_24H = 24 * 60
+HOURS_7D = 7 * 24
+
+def _now_minute() -> int:
+    return int(time.time() // 60)
+
+class RollingCounter:
+    """Ковзні вікна 24 год (хвилинні кошики) і 7 днів (годинні кошики) у кільцевих буферах"""
+
+    __slots__ = ("_minutes", "_hours", "_minute", "total_24h", "total_7d")
+
+    def __init__(self, now: int = None):
+        self._minutes = array("L", [0] * MINUTES_24H)
+        self._hours = array("L", [0] * HOURS_7D)
+        self._minute = _now_minute() if now is None else now
+        self.total_24h = 0
+        self.total_7d = 0
+
+    def _advance(self, now: int):
+        """Очистити кошики, що випали з вікна"""
+        if now <= self._minute:
+            return
+        for minute in range(self._minute + 1, min(now, self._minute + MINUTES_24H) + 1):
+            slot = minute % MINUTES_24H
+            self.total_24h -= self._minutes[slot]
+            self._minutes[slot] = 0
+
+        last_hour, hour = self._minute // 60, now // 60
+        for h in range(last_hour + 1, min(hour, last_hour + HOURS_7D) + 1):
+            slot = h % HOURS_7D
+            self.total_7d -= self._hours[slot]
+            self._hours[slot] = 0
+        self._minute = now
+
+    def add(self, amount: int = 1, now: int = None):
+        now = _now_minute() if now is None else now
+        self._advance(now)
+        self._minutes[now % MINUTES_24H] += amount
+        self._hours[(now // 60) % HOURS_7D] += amount
+        self.total_24h += amount
+        self.total_7d += amount
+
+    def seed(self, total_24h: int, total_7d: int, minute: int, now: int = None):
+        """Додати збережені підсумки, рівномірно розподіливши їх по кошиках вікон, що закінчуються хвилиною minute"""
+        now = _now_minute() if now is None else now
+        self._advance(now)
+        self.total_24h += self._spread(self._minutes, total_24h, minute, now, MINUTES_24H)
+        self.total_7d += self._spread(self._hours, total_7d, minute // 60, now // 60, HOURS_7D)
+
+    @staticmethod
+    def _spread(buckets, total: int, last: int, now: int, size: int) -> int:
+        """Рівні частки в size кошиків до last включно; частки кошиків, що вже випали з вікна, відкидаються"""
+        added = 0
+        for offset in range(size):
+            slot = last - offset
+            if slot <= now - size:
+                break
+            # Цілі частки без накопичення похибки: сума по всіх кошиках дорівнює total
+            share = (offset + 1) * total // size - offset * total // size
+            buckets[slot % size] += share
+            added += share
+        return added
+
+    def totals(self, now: int = None) -> tuple:
+        self._advance(_now_minute() if now is None else now)
+        return self.total_24h, self.total_7d
+
+class RollingCounters:
+    """Лічильники по серверах: {guild_id: {назва: RollingCounter}}, створюються при першій події.
+    Відомі сервери без подій мають нульові вікна"""
+
+    def __init__(self, names: tuple = ()):
+        self.names = names
+        self._guilds = {}
+        self._known = set()  # guild_id, для яких пишемо підсумки (нулі, якщо подій не було)
+        self._written = {}  # guild_id -> останні записані підсумки
+
+    def track(self, guild_id: int):
+        self._known.add(guild_id)
+
+    def forget(self, guild_id: int):
+        self._known.discard(guild_id)
+        self._guilds.pop(guild_id, None)
+        self._written.pop(guild_id, None)
+
+    def add(self, guild_id: int, name: str, amount: int = 1):
+        self._known.add(guild_id)
+        counters = self._guilds.setdefault(guild_id, {})
+        counter = counters.get(name)
+        if counter is None:
+            counter = counters[name] = RollingCounter()
+        counter.add(amount)
+
+    def seed(self, guild_id: int, values: dict, minute: int = None):
+        """Продовжити вікна з підсумків, записаних у хвилину minute (після рестарту)"""
+        now = _now_minute()
+        minute = now if minute is None else min(minute, now)
+        self._known.add(guild_id)
+        written = {}
+        for name in self.names:
+            total_24h, total_7d = values.get(f"{name}_24h", 0), values.get(f"{name}_7d", 0)
+            written[f"{name}_24h"], written[f"{name}_7d"] = total_24h, total_7d
+            if total_24h or total_7d:
+                counters = self._guilds.setdefault(guild_id, {})
+                counter = counters.get(name)
+                if counter is None:
+                    counter = counters[name] = RollingCounter(now)
+                counter.seed(total_24h, total_7d, minute, now)
+        self._written[guild_id] = written
+
+    def snapshot(self) -> dict:
+        """{guild_id: {"<назва>_24h": n, "<назва>_7d": n}} для відомих серверів, де підсумки змінилися"""
+        now = _now_minute()
+        changed = {}
+        for guild_id in self._known:
+            values = {}
+            for name in self.names:
+                values[f"{name}_24h"] = values[f"{name}_7d"] = 0
+            for name, counter in self._guilds.get(guild_id, {}).items():
+                values[f"{name}_24h"], values[f"{name}_7d"] = counter.totals(now)
+            if self._written.get(guild_id) != values:
+                changed[guild_id] = values
+        return changed
+
+    def mark_written(self, written: dict):
+        """Після успішного запису: запам'ятати підсумки і прибрати лічильники, що спорожніли (сервер лишається відомим)"""
+        for guild_id, values in written.items():
+            self._written[guild_id] = values
+            if not any(values.values()):
+                self._guilds.pop(guild_id, None)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from collections import deque
+import discord
+from modules.logger import Logger
+
+log = Logger("RoomPool")
+
+# Скільки прихованих запасних каналів тримати на сервер (0 - пул вимкнено)
+ROOM_POOL_SIZE = int(os.getenv("ROOM_POOL_SIZE", "0"))
+SPARE_NAME = "spare-room"
+# Пауза між створеннями запасних каналів, щоб не впиратися в rate limit
+REFILL_DELAY = 2.0
+
+class RoomPool:
+    """Запасні приховані voice-канали: при вході в канал-створювач кімнату перейменовують, а не створюють"""
+
+    def __init__(self, size: int = ROOM_POOL_SIZE):
+        self.size = size
+        self._spares = {}  # guild_id -> [channel_id], список змінюється лише на місці
+        self._refilling = set()  # guild_id, для яких зараз працює refill
+        self._adopted = set()  # guild_id, де вже підхопили запасні канали попереднього запуску
+        self._locks = {}  # guild_id -> asyncio.Lock, черга створення кімнат сервера
+        self._latencies = deque(maxlen=500)
+        self.pooled = 0
+        self.cold = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def lock(self, guild_id: int) -> asyncio.Lock:
+        lock = self._locks.get(guild_id)
+        if lock is None:
+            lock = self._locks[guild_id] = asyncio.Lock()
+        return lock
+
+    def _live_spares(self, guild):
+        """Прибрати зі списку канали, яких уже немає або які хтось зайняв"""
+        spares = self._spares.setdefault(guild.id, [])
+        live = []
+        for channel_id in spares:
+            channel = guild.get_channel(channel_id)
+            if channel and not channel.members:
+                live.append(channel_id)
+        # Той самий об'єкт списку: refill між await-ами дописує в нього ж
+        spares[:] = live
+        return spares
+
+    def acquire(self, guild):
+        """Запасний канал або None"""
+        if not self.enabled:
+            return None
+        spares = self._live_spares(guild)
+        if not spares:
+            return None
+        return guild.get_channel(spares.pop(0))
+
+    def release(self, guild, channel):
+        """Повернути запасний канал, який не вдалося перетворити на кімнату"""
+        spares = self._spares.setdefault(guild.id, [])
+        if channel.id not in spares:
+            spares.insert(0, channel.id)
+
+    async def refill(self, guild, category):
+        """Довести кількість запасних каналів сервера до size: створити нестачу, видалити надлишок"""
+        # Два паралельні поповнення одного сервера створили б зайві канали
+        if guild.id in self._refilling:
+            return
+        spares = self._spares.setdefault(guild.id, [])
+        if guild.id not in self._adopted:
+            # Після рестарту підхоплюємо вже створені запасні канали (навіть якщо acquire() уже завів список)
+            spares.extend(
+                channel.id for channel in category.voice_channels
+                if channel.name == SPARE_NAME and not channel.members and channel.id not in spares
+            )
+            self._adopted.add(guild.id)
+
+        self._refilling.add(guild.id)
+        try:
+            # Стан перечитується після кожного await: acquire() міг забрати канал
+            while len(self._live_spares(guild)) != self.size:
+                # Під час напливу користувачів черга сервера важливіша за поповнення
+                if self.lock(guild.id).locked():
+                    return
+                if len(spares) > self.size:
+                    # ROOM_POOL_SIZE зменшили - зайві канали прибираємо
+                    channel = guild.get_channel(spares.pop())
+                    if channel is not None:
+                        try:
+                            await channel.delete()
+                        except discord.NotFound:
+                            pass
+                else:
+                    channel = await category.create_voice_channel(
+                        name=SPARE_NAME,
+                        overwrites={
+                            guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False),
+                            guild.me: discord.PermissionOverwrite(view_channel=True, connect=True, manage_channels=True, move_members=True)
+                        }
+                    )
+                    spares.append(channel.id)
+                await asyncio.sleep(REFILL_DELAY)
+        finally:
+            self._refilling.discard(guild.id)
+
+    def record(self, started: float, pooled: bool):
+        """Час від входу в канал-створювач до переносу в готову кімнату"""
+        elapsed = time.perf_counter() - started
+        self._latencies.append(elapsed)
+        if pooled:
+            self.pooled += 1
+        else:
+            self.cold += 1
+        log.debug(f"Room ready in {elapsed * 1000:.0f} ms ({'pool' if pooled else 'created'})")
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000) if latencies else 0
+
+        return {
+            "pooled": self.pooled,
+            "cold": self.cold,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "spares": sum(len(spares) for spares in self._spares.values())
+        }
+
+room_pool = RoomPool()
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+import discord
+from modules.db import private_rooms
+from modules.voice_rooms import voice_rooms
+from modules.logger import Logger
+
+log = Logger("RoomTeardown")
+
+# Скільки секунд порожня кімната чекає на повернення учасників
+ROOM_GRACE_SECONDS = float(os.getenv("ROOM_GRACE_SECONDS", "60"))
+# Пауза між видаленнями каналів одного сервера
+DELETE_DELAY = 0.5
+# Скільки каналів звірка видаляє одночасно
+RECONCILE_CONCURRENCY = 2
+
+class RoomTeardown:
+    """Відкладене видалення порожніх кімнат: повернення до кінця grace-періоду скасовує видалення"""
+
+    def __init__(self, grace: float = ROOM_GRACE_SECONDS):
+        self.grace = grace
+        self._pending = {}  # guild_id -> {channel_id: (дедлайн, канал, кімната)}
+        self._workers = {}  # guild_id -> задача видалення
+        self.scheduled = 0
+        self.cancelled = 0
+        self.deleted = 0
+
+    def is_pending(self, guild_id: int, channel_id: int) -> bool:
+        return channel_id in self._pending.get(guild_id, {})
+
+    def schedule(self, channel, room: dict):
+        guild_id = channel.guild.id
+        pending = self._pending.setdefault(guild_id, {})
+        if channel.id in pending:
+            return
+        pending[channel.id] = (time.monotonic() + self.grace, channel, room)
+        self.scheduled += 1
+
+        worker = self._workers.get(guild_id)
+        if worker is None or worker.done():
+            self._workers[guild_id] = asyncio.create_task(self._run(guild_id))
+
+    def cancel(self, guild_id: int, channel_id: int) -> bool:
+        """Хтось повернувся - кімната лишається, пара видалення/створення не знадобилась"""
+        if self._pending.get(guild_id, {}).pop(channel_id, None) is None:
+            return False
+        self.cancelled += 1
+        return True
+
+    async def _run(self, guild_id: int):
+        pending = self._pending[guild_id]
+        while pending:
+            now = time.monotonic()
+            wait = min(deadline for deadline, _, _ in pending.values()) - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            # Всі кімнати сервера, чий час вийшов, - однією порцією
+            due = [channel_id for channel_id, (deadline, _, _) in pending.items() if deadline <= now]
+            rooms = []
+            for channel_id in due:
+                entry = pending.pop(channel_id, None)
+                if entry is None:
+                    continue
+                _, channel, room = entry
+                if channel.members:
+                    continue
+                try:
+                    await channel.delete()
+                except discord.NotFound:
+                    pass
+                except discord.HTTPException as e:
+                    log.warning(f"Failed to delete room {channel_id}: {e}")
+                    continue
+                rooms.append(room)
+                await asyncio.sleep(DELETE_DELAY)
+
+            if rooms:
+                try:
+                    await voice_rooms.deactivate_many(rooms, discord.utils.utcnow())
+                    self.deleted += len(rooms)
+                    log.debug(f"Deleted {len(rooms)} rooms in guild {guild_id}, stats: {self.stats()}")
+                except Exception as e:
+                    log.error(f"Failed to deactivate {len(rooms)} rooms in guild {guild_id}: {e}")
+        self._workers.pop(guild_id, None)
+
+    async def flush(self):
+        """Видалити все, що чекає (при вивантаженні кога)"""
+        for worker in self._workers.values():
+            worker.cancel()
+        for pending in self._pending.values():
+            for channel_id, (_, channel, room) in pending.items():
+                pending[channel_id] = (0, channel, room)
+        await asyncio.gather(*(self._run(guild_id) for guild_id in list(self._pending)), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "avoided_pairs": self.cancelled,
+            "deleted": self.deleted,
+            "pending": sum(len(pending) for pending in self._pending.values())
+        }
+
+room_teardown = RoomTeardown()
+
+async def reconcile_rooms(guilds, concurrency: int = RECONCILE_CONCURRENCY) -> dict:
+    """Звірити активні записи private_rooms з каналами в кеші: прибрати порожні канали і записи без каналів"""
+    semaphore = asyncio.Semaphore(concurrency)
+    report = {"checked": 0, "deleted_channels": 0, "stale_rows": 0, "failed": 0, "in_use": 0}
+    stale = []
+
+    async def delete(channel, room):
+        async with semaphore:
+            # Поки чекали на семафор і паузи інших видалень, власник міг повернутися в кімнату
+            if channel.members or room_teardown.is_pending(channel.guild.id, channel.id):
+                report["in_use"] += 1
+                return
+            try:
+                await channel.delete()
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                log.warning(f"Failed to delete orphaned room {channel.id}: {e}")
+                report["failed"] += 1
+                return
+            report["deleted_channels"] += 1
+            stale.append(room)
+            await asyncio.sleep(DELETE_DELAY)
+
+    for guild in guilds:
+        deletions = []
+        async for room in private_rooms.iter_active(guild.id):
+            report["checked"] += 1
+            channel = guild.get_channel(room["channel_id"])
+            if channel is None:
+                stale.append(room)
+            elif not channel.members and not room_teardown.is_pending(guild.id, channel.id):
+                deletions.append(delete(channel, room))
+        if deletions:
+            await asyncio.gather(*deletions)
+        # Низький пріоритет: між серверами віддаємо цикл подій іншим задачам
+        await asyncio.sleep(0)
+
+    if stale:
+        await voice_rooms.deactivate_many(stale, discord.utils.utcnow())
+    report["stale_rows"] = len(stale) - report["deleted_channels"]
+    return report
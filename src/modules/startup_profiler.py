@@ -0,0 +1,78 @@
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+from modules.logger import Logger
+
+log = Logger("Startup")
+
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "5000"))
+
+class StartupProfiler:
+    """Час завантаження кожного розширення (імпорти окремо від решти) і найдорожчі імпортовані модулі"""
+
+    def __init__(self, budget_ms: int = STARTUP_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.extensions = []  # (назва, загальний час, час імпортів)
+        self.modules = {}  # модуль -> власний час імпорту без вкладених
+        self._children = []  # стек: час вкладених імпортів для кожного активного __import__
+        self._import_time = 0.0  # сумарний час імпортів верхнього рівня
+        self._original_import = None
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        loaded = len(sys.modules)
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            else:
+                self._import_time += elapsed
+            # Рахуємо тільки імпорти, що справді щось завантажили
+            if len(sys.modules) > loaded:
+                if level and globals:
+                    name = f"{globals.get('__package__') or ''}.{name}".strip(".")
+                self.modules[name] = self.modules.get(name, 0.0) + elapsed - children
+
+    @contextmanager
+    def extension(self, name: str):
+        started = time.perf_counter()
+        import_time = self._import_time
+        try:
+            yield
+        finally:
+            self.extensions.append((name, time.perf_counter() - started, self._import_time - import_time))
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def report(self, top: int = 10):
+        for name, total, imports in sorted(self.extensions, key=lambda item: item[1], reverse=True):
+            log.info(f"{name}: {total * 1000:.0f} ms (imports {imports * 1000:.0f} ms, setup {(total - imports) * 1000:.0f} ms)")
+
+        heaviest = sorted(self.modules.items(), key=lambda item: item[1], reverse=True)[:top]
+        if heaviest:
+            log.info("Heaviest imports: " + ", ".join(f"{name} {cost * 1000:.0f} ms" for name, cost in heaviest))
+
+        elapsed = self.elapsed_ms
+        if elapsed > self.budget_ms:
+            log.warning(f"Startup took {elapsed:.0f} ms, over the {self.budget_ms} ms budget")
+        else:
+            log.info(f"Startup took {elapsed:.0f} ms (budget {self.budget_ms} ms)")
@@ -0,0 +1,90 @@
+import copy
+import time
+from typing import Optional
+from modules.db import tickets as tickets_repo, ticket_config
+from modules.logger import Logger
+
+log = Logger("Tickets")
+
+# Скільки секунд конфіг тікетів сервера живе в кеші (update_config скидає раніше)
+CONFIG_TTL = 300
+
+class TicketConfigCache:
+    """ticket_config з TTL-кешем: кнопка створення тікета не ходить у БД"""
+
+    def __init__(self, ttl: float = CONFIG_TTL):
+        self.ttl = ttl
+        self._cache = {}  # guild_id -> (час завантаження, конфіг)
+
+    async def get(self, guild_id: int) -> dict:
+        cached = self._cache.get(guild_id)
+        if cached is None or time.monotonic() - cached[0] > self.ttl:
+            cached = self._cache[guild_id] = (time.monotonic(), await ticket_config.get(guild_id))
+        # Копія: той, хто викликає, може змінювати списки в конфігу
+        return copy.deepcopy(cached[1])
+
+    def invalidate(self, guild_id: int):
+        self._cache.pop(guild_id, None)
+
+class TicketRegistry:
+    """Відкриті тікети по серверах: (guild_id, opener_id) -> channel_id, всі зміни пишуться в БД і сюди одночасно"""
+
+    def __init__(self):
+        self._open = {}  # guild_id -> {opener_id: channel_id}
+        self._by_channel = {}  # channel_id -> (guild_id, opener_id)
+        self.loaded = False
+
+    async def load(self):
+        self._open = {}
+        self._by_channel = {}
+        for ticket in await tickets_repo.list_open():
+            self._add(ticket["guild_id"], ticket["opener_id"], ticket["channel_id"])
+        self.loaded = True
+        log.info(f"Tickets loaded: {len(self._by_channel)} open")
+
+    def _add(self, guild_id, opener_id, channel_id):
+        self._open.setdefault(guild_id, {})[opener_id] = channel_id
+        self._by_channel[channel_id] = (guild_id, opener_id)
+
+    def is_ticket(self, channel_id: int) -> bool:
+        return channel_id in self._by_channel
+
+    async def get_open(self, guild_id: int, opener_id: int) -> Optional[int]:
+        """channel_id відкритого тікета користувача або None"""
+        if not self.loaded:
+            ticket = await tickets_repo.get_open(guild_id, opener_id)
+            return ticket["channel_id"] if ticket else None
+        return self._open.get(guild_id, {}).get(opener_id)
+
+    async def open(self, guild_id: int, opener_id: int, channel_id: int, opened_at):
+        await tickets_repo.open(guild_id, opener_id, channel_id, opened_at)
+        self._add(guild_id, opener_id, channel_id)
+
+    async def close(self, channel_id: int, closed_at):
+        await tickets_repo.close(channel_id, closed_at)
+        owner = self._by_channel.pop(channel_id, None)
+        if owner is not None:
+            guild_id, opener_id = owner
+            if self._open.get(guild_id, {}).get(opener_id) == channel_id:
+                del self._open[guild_id][opener_id]
+
+    async def adopt(self, guild, opened_at):
+        """Тікети, створені до появи реєстру: канали ticket-* з "User ID: <id>" у темі"""
+        adopted = 0
+        for channel in guild.text_channels:
+            if not channel.name.startswith("ticket-") or not (channel.topic or "").startswith("User ID: "):
+                continue
+            if channel.id in self._by_channel:
+                continue
+            try:
+                opener_id = int(channel.topic[len("User ID: "):].strip())
+            except ValueError:
+                continue
+            if opener_id in self._open.get(guild.id, {}):
+                continue
+            await self.open(guild.id, opener_id, channel.id, opened_at)
+            adopted += 1
+        return adopted
+
+ticket_configs = TicketConfigCache()
+tickets = TicketRegistry()
@@ -0,0 +1,90 @@
+from typing import Optional
+from modules.db import private_rooms, server_configs
+from modules.logger import Logger
+
+log = Logger("VoiceRooms")
+
+class VoiceRoomRegistry:
+    """Канали-створювачі та активні приватні кімнати в пам'яті; всі зміни пишуться в БД і сюди одночасно"""
+
+    def __init__(self):
+        self._creators = {}  # guild_id -> creator_channel_id
+        self._by_channel = {}  # channel_id -> кімната
+        self._by_owner = {}  # owner_id -> кімната
+        self.loaded = False
+
+    async def load(self):
+        configs = await server_configs.list_configured()
+        rooms = await private_rooms.list_active()
+        self._creators = {config["guild_id"]: config["creator_channel_id"] for config in configs}
+        self._by_channel = {}
+        self._by_owner = {}
+        for room in rooms:
+            self._add(room)
+        self.loaded = True
+        log.info(f"Voice rooms loaded: {len(self._creators)} creator channels, {len(rooms)} active rooms")
+
+    def _add(self, room):
+        self._by_channel[room["channel_id"]] = room
+        self._by_owner[room["owner_id"]] = room
+
+    def _remove(self, room):
+        if self._by_channel.get(room["channel_id"]) is room:
+            del self._by_channel[room["channel_id"]]
+        if self._by_owner.get(room["owner_id"]) is room:
+            del self._by_owner[room["owner_id"]]
+
+    def creators(self) -> dict:
+        """{guild_id: creator_channel_id} (порожньо, поки реєстр не завантажено)"""
+        return dict(self._creators)
+
+    async def is_creator(self, guild_id: int, channel_id: int) -> bool:
+        if not self.loaded:
+            config = await server_configs.get(guild_id)
+            return bool(config) and config.get("creator_channel_id") == channel_id
+        return self._creators.get(guild_id) == channel_id
+
+    async def get_by_channel(self, channel_id: int) -> Optional[dict]:
+        if not self.loaded:
+            return await private_rooms.get_active_by_channel(channel_id)
+        return self._by_channel.get(channel_id)
+
+    async def get_by_owner(self, owner_id: int) -> Optional[dict]:
+        if not self.loaded:
+            return await private_rooms.get_active_by_owner(owner_id)
+        return self._by_owner.get(owner_id)
+
+    async def set_config(self, guild_id: int, data: dict):
+        await server_configs.update(guild_id, data)
+        if "creator_channel_id" in data:
+            self._creators[guild_id] = data["creator_channel_id"]
+
+    async def create(self, room: dict):
+        await private_rooms.create(room)
+        self._add(room)
+
+    async def update_by_owner(self, owner_id: int, data: dict):
+        await private_rooms.update_active_by_owner(owner_id, data)
+        room = self._by_owner.get(owner_id)
+        if room is not None:
+            self.apply(room, data)
+
+    def apply(self, room: dict, data: dict):
+        """Змінити кімнату тільки в пам'яті (запис у БД робить той, хто викликає)"""
+        self._remove(room)
+        room.update(data)
+        self._add(room)
+
+    async def deactivate(self, room: dict, deleted_at):
+        await private_rooms.deactivate(room["_id"], deleted_at)
+        self._remove(room)
+
+    async def deactivate_many(self, rooms: list, deleted_at):
+        await private_rooms.deactivate_many([room["_id"] for room in rooms], deleted_at)
+        for room in rooms:
+            # Запис могли прочитати з БД окремо - шукаємо нашу копію за каналом
+            registered = self._by_channel.get(room["channel_id"])
+            if registered is not None and registered["_id"] == room["_id"]:
+                self._remove(registered)
+
+voice_rooms = VoiceRoomRegistry()
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone, timedelta
+from pymongo import ReplaceOne, DeleteOne
+from modules.logger import Logger
+
+log = Logger("Voice")
+
+VOICE_XP_PER_MINUTE = 5
+# Якщо бот був офлайн довше - час до рестарту не зараховуємо
+RECOVERY_WINDOW = timedelta(minutes=10)
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+class VoiceSessionTracker:
+    """Сесії у voice в пам'яті: хвилини нараховуються при виході та на періодичному чекпоінті"""
+
+    def __init__(self, accumulator, collection):
+        self.accumulator = accumulator
+        self.collection = collection
+        self._sessions = {}  # (guild_id, user_id) -> [member, started_at]
+        self._closed = set()
+        self._recovered = False
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def join(self, member, now: datetime = None):
+        key = (member.guild.id, member.id)
+        session = self._sessions.get(key)
+        if session:
+            session[0] = member
+            return
+        self._sessions[key] = [member, now or _utcnow()]
+        self._closed.discard(key)
+
+    def leave(self, member, now: datetime = None):
+        key = (member.guild.id, member.id)
+        session = self._sessions.pop(key, None)
+        if not session:
+            return 0
+        self._closed.add(key)
+        return self._credit(member, session[1], now or _utcnow())
+
+    def _credit(self, member, started_at: datetime, now: datetime):
+        """Нарахувати повні хвилини з started_at, повертає кількість хвилин"""
+        minutes = int((now - started_at).total_seconds() // 60)
+        if minutes > 0:
+            self.accumulator.add(member.guild.id, member, xp=minutes * VOICE_XP_PER_MINUTE, voice_minutes=minutes)
+        return max(minutes, 0)
+
+    async def checkpoint(self):
+        """Нарахувати хвилини відкритим сесіям і зберегти їх одним bulk_write"""
+        now = _utcnow()
+        credited = 0
+        ops = []
+        for (guild_id, user_id), session in self._sessions.items():
+            member, started_at = session
+            minutes = self._credit(member, started_at, now)
+            credited += minutes
+            # Залишок неповної хвилини переноситься на наступний чекпоінт
+            session[1] = started_at + timedelta(minutes=minutes)
+            ops.append(ReplaceOne(
+                {"_id": f"{guild_id}:{user_id}"},
+                {"guild_id": guild_id, "user_id": user_id, "since": session[1]},
+                upsert=True
+            ))
+        # Нова множина до await: сесії, закриті під час запису, потраплять у наступний чекпоінт
+        closed, self._closed = self._closed, set()
+        ops.extend(DeleteOne({"_id": f"{guild_id}:{user_id}"}) for guild_id, user_id in closed)
+
+        if ops:
+            try:
+                await self.collection.bulk_write(ops, ordered=False)
+            except Exception:
+                # Хто встиг повернутися у voice, той знову має відкриту сесію - її не видаляємо
+                self._closed |= {key for key in closed if key not in self._sessions}
+                raise
+        log.debug(f"Voice checkpoint: {len(self._sessions)} open sessions, {credited} minutes credited")
+        return credited
+
+    async def sync(self, guilds):
+        """Звірити сесії з поточним станом voice (старт бота та реконект)"""
+        persisted = {}
+        if not self._recovered:
+            async for doc in self.collection.find({}):
+                since = doc["since"]
+                if since.tzinfo is None:
+                    since = since.replace(tzinfo=timezone.utc)
+                persisted[(doc["guild_id"], doc["user_id"])] = since
+            self._recovered = True
+
+        now = _utcnow()
+        present = set()
+        for guild in guilds:
+            for vc in guild.voice_channels:
+                for member in vc.members:
+                    if member.bot:
+                        continue
+                    key = (guild.id, member.id)
+                    present.add(key)
+                    if key in self._sessions:
+                        continue
+                    since = persisted.get(key)
+                    self.join(member, since if since and now - since <= RECOVERY_WINDOW else now)
+
+        # Ті, хто вийшов, поки бот не бачив подій
+        for key in [key for key in self._sessions if key not in present]:
+            self.leave(self._sessions[key][0], now)
+        self._closed.update(key for key in persisted if key not in present)
+
+        log.info(f"Voice sessions synced: {len(self._sessions)} open ({len(persisted)} persisted in DB)")
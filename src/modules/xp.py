@@ -0,0 +1,414 @@
+import asyncio
+import uuid
+from datetime import date
+from pymongo import UpdateOne, ReturnDocument
+from modules.pipeline import PendingWrite, failed_ops
+from modules.logger import Logger
+
+log = Logger("XP")
+
+# Скільки рівнів максимум можна взяти за одне оновлення
+MAX_LEVEL_STEPS = 100
+# Скільки останніх днів XP зберігаємо в кільцевому буфері hist
+HISTORY_DAYS = 30
+# Вага рівня в рейтингу: score = xp + level * LEVEL_SCORE
+LEVEL_SCORE = 1000
+# Скільки разів повторювати операцію, яку сервер відхилив, перш ніж відкинути її
+MAX_FLUSH_ATTEMPTS = 3
+# Скільки останніх токенів flush зберігається в документі (повтор з тим самим токеном не застосується двічі)
+FLUSH_TOKENS = 10
+DUPLICATE_KEY = 11000
+# Ключ документа користувача
+USER_KEY = [("guild_id", 1), ("user_id", 1)]
+
+SCORE_EXPRESSION = {"$add": [
+    {"$ifNull": ["$xp", 0]},
+    {"$multiply": [{"$ifNull": ["$level", 1]}, LEVEL_SCORE]}
+]}
+
+def get_level_xp(level):
+    return 5 * (level ** 2) + 50 * level + 100
+
+def roll_levels(xp: int, level: int):
+    """Python-версія перерахунку рівня з build_activity_update"""
+    for _ in range(MAX_LEVEL_STEPS):
+        needed = get_level_xp(level)
+        if xp < needed:
+            break
+        xp -= needed
+        level += 1
+    return xp, level
+
+def get_score(user_data: dict):
+    return user_data.get("xp", 0) + user_data.get("level", 1) * LEVEL_SCORE
+
+def _add(field, value, default=0):
+    return {"$add": [{"$ifNull": [f"${field}", default]}, value]}
+
+def history_ordinal(day: date = None):
+    return (day or date.today()).toordinal()
+
+def _history_slot(ordinal: int, value: int):
+    """Вираз для слоту hist.<ordinal % HISTORY_DAYS>: додати до того ж дня або перезаписати старіший"""
+    slot = f"hist.{ordinal % HISTORY_DAYS}"
+    return slot, {"$switch": {
+        "branches": [
+            {"case": {"$eq": [f"${slot}.d", ordinal]},
+             "then": {"d": ordinal, "xp": {"$add": [f"${slot}.xp", value]}}},
+            {"case": {"$gt": [{"$ifNull": [f"${slot}.d", 0]}, ordinal]},
+             "then": f"${slot}"}
+        ],
+        "default": {"d": ordinal, "xp": value}
+    }}
+
+def get_history(user_data: dict, days: int = 7):
+    """XP за останні `days` днів (від найстаршого до сьогодні)"""
+    today = history_ordinal()
+    hist = user_data.get("hist") or {}
+    # Документи, які ще не пройшли міграцію, мають старий формат history
+    legacy = user_data.get("history") or {}
+
+    values = []
+    for ordinal in range(today - days + 1, today + 1):
+        value = legacy.get(date.fromordinal(ordinal).isoformat(), 0)
+        slot = hist.get(str(ordinal % HISTORY_DAYS))
+        if slot and slot.get("d") == ordinal:
+            value += slot.get("xp", 0)
+        values.append(value)
+    return values
+
+def build_activity_update(xp: int = 0, messages: int = 0, reactions: int = 0, voice_minutes: int = 0,
+                          history: dict = None, profile: dict = None):
+    """Пайплайн оновлення користувача: інкременти та перерахунок рівня за одну операцію"""
+    fields = {
+        "xp": {"$max": [0, _add("xp", xp)]},
+        "level": {"$ifNull": ["$level", 1]},
+        "messages": _add("messages", messages),
+        "reactions": _add("reactions", reactions),
+        "voice_minutes": _add("voice_minutes", voice_minutes)
+    }
+    for ordinal, value in (history or {}).items():
+        slot, expression = _history_slot(ordinal, value)
+        fields[slot] = expression
+    # $literal - щоб ім'я на кшталт "$xp" не сприйнялось як шлях до поля
+    for field, value in (profile or {}).items():
+        fields[field] = {"$literal": value}
+
+    # Та сама формула, що й get_level_xp, але на стороні MongoDB
+    needed = {"$add": [
+        {"$multiply": [5, "$$value.level", "$$value.level"]},
+        {"$multiply": [50, "$$value.level"]},
+        100
+    ]}
+    return [
+        {"$set": fields},
+        {"$set": {"_level_up": {"$reduce": {
+            "input": {"$range": [0, MAX_LEVEL_STEPS]},
+            "initialValue": {"xp": "$xp", "level": "$level"},
+            "in": {"$cond": [
+                {"$gte": ["$$value.xp", needed]},
+                {"xp": {"$subtract": ["$$value.xp", needed]}, "level": {"$add": ["$$value.level", 1]}},
+                "$$value"
+            ]}
+        }}}},
+        {"$set": {"xp": "$_level_up.xp", "level": "$_level_up.level"}},
+        {"$unset": "_level_up"},
+        {"$set": {"score": SCORE_EXPRESSION}}
+    ]
+
+def build_fields_update(data: dict):
+    """Пайплайн для прямого встановлення полів (рівень, XP) з перерахунком score"""
+    return [
+        {"$set": {field: {"$literal": value} for field, value in data.items()}},
+        {"$set": {"score": SCORE_EXPRESSION}}
+    ]
+
+async def add_activity(collection, guild_id: int, user_id: int, **kwargs):
+    """Атомарно додати активність користувачу і повернути оновлений документ"""
+    return await collection.find_one_and_update(
+        {"guild_id": guild_id, "user_id": user_id},
+        build_activity_update(**kwargs),
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+class XPAccumulator:
+    """Накопичує приріст XP/повідомлень/реакцій у пам'яті та скидає їх одним bulk_write"""
+
+    def __init__(self, repository, max_pending: int = 500, on_flush=None, retry_upsert: bool = False):
+        self.repository = repository
+        self.on_flush = on_flush
+        self.max_pending = max_pending
+        # Повтор з upsert безпечний лише з унікальним індексом (guild_id, user_id), див. ensure_unique_users
+        self.retry_upsert = retry_upsert
+        self._pending = {}
+        self._retry = []  # (key, delta, op, відправлено, відхилено) - записи з невідомим або невдалим результатом
+        self._events = 0
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, guild_id: int, member, xp: int = 0, messages: int = 0, reactions: int = 0, voice_minutes: int = 0):
+        """Додати приріст для користувача (без звернення до БД)"""
+        key = (guild_id, member.id)
+        delta = self._pending.get(key)
+        if delta is None:
+            delta = self._pending[key] = {
+                "xp": 0,
+                "messages": 0,
+                "reactions": 0,
+                "voice_minutes": 0,
+                "history": {}
+            }
+
+        delta["xp"] += xp
+        delta["messages"] += messages
+        delta["reactions"] += reactions
+        delta["voice_minutes"] += voice_minutes
+        if xp:
+            today = history_ordinal()
+            delta["history"][today] = delta["history"].get(today, 0) + xp
+
+        # Ім'я та аватар для сайту - беремо найсвіжіші
+        delta["username"] = member.display_name
+        delta["avatar"] = member.display_avatar.url if member.display_avatar else None
+        self._events += 1
+
+        if len(self._pending) >= self.max_pending and not (self._flush_task and not self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    @staticmethod
+    def _build_op(key, delta, upsert: bool = True):
+        guild_id, user_id = key
+        token = delta["token"]
+        update = build_activity_update(
+            xp=delta["xp"],
+            messages=delta["messages"],
+            reactions=delta["reactions"],
+            voice_minutes=delta["voice_minutes"],
+            history=delta["history"],
+            profile={"username": delta["username"], "avatar": delta["avatar"]}
+        )
+        update.append({"$set": {"flushes": {"$slice": [
+            {"$concatArrays": [{"$ifNull": ["$flushes", []]}, [token]]},
+            -FLUSH_TOKENS
+        ]}}})
+        # Документ, у якому вже є цей токен, не збігається з фільтром - повтор нічого не додасть
+        return UpdateOne({"guild_id": guild_id, "user_id": user_id, "flushes": {"$ne": token}}, update, upsert=upsert)
+
+    def _applied(self, batch):
+        if self.on_flush:
+            self.on_flush([(key, delta) for key, delta, *_ in batch])
+
+    def _handle_failure(self, batch, failed):
+        """failed - {індекс: код помилки} від BulkWriteError або None, якщо невідомо, що записалось"""
+        applied = []
+        for index, (key, delta, op, sent, rejected) in enumerate(batch):
+            sent += 1
+            if failed is not None and index not in failed:
+                applied.append((key, delta))
+                continue
+            if failed is not None and failed[index] == DUPLICATE_KEY and sent > 1:
+                # Повтор: документ уже має токен, тож фільтр не збігся, а upsert вперся в унікальний індекс
+                applied.append((key, delta))
+                continue
+            if failed is not None:
+                # Сервер явно відхилив операцію - рахуємо відмови, щоб одна "отруйна" дельта не крутилась вічно
+                rejected += 1
+                if rejected >= MAX_FLUSH_ATTEMPTS:
+                    log.error(f"Dropping XP delta for {key} after {rejected} rejected writes: code {failed[index]}")
+                    continue
+            self._retry.append((key, delta, op, sent, rejected))
+        if applied and self.on_flush:
+            self.on_flush(applied)
+
+    def collect(self):
+        """Забрати накопичене як PendingWrite; невдалі операції повторюються з тим самим токеном"""
+        if self._retry:
+            # Спершу з'ясовуємо долю попереднього запису; нові дельти тим часом накопичуються в _pending
+            batch, self._retry = self._retry, []
+            events = 0
+            if not self.retry_upsert:
+                # Без унікального індексу upsert застосованого запису створив би дубль користувача;
+                # без upsert губиться хіба що перша дельта нового користувача
+                batch = [(key, delta, self._build_op(key, delta, upsert=False), sent, rejected)
+                         for key, delta, _, sent, rejected in batch]
+        elif self._pending:
+            token = uuid.uuid4().hex
+            pending, events = self._pending, self._events
+            self._pending, self._events = {}, 0
+            batch = []
+            for key, delta in pending.items():
+                delta["token"] = token
+                batch.append((key, delta, self._build_op(key, delta), 0, 0))
+        else:
+            return None
+
+        ops = [op for _, _, op, *_ in batch]
+
+        def on_success():
+            self._applied(batch)
+            log.debug(f"Flushed {len(ops)} user updates, coalesced {events} events")
+
+        return PendingWrite(self.repository, ops, on_success, lambda failed: self._handle_failure(batch, failed))
+
+    async def flush(self):
+        """Записати всі накопичені зміни в БД"""
+        async with self._lock:
+            written = 0
+            # Після повтору невдалого запису в буфері можуть лишатись нові дельти
+            for _ in range(2):
+                write = self.collect()
+                if write is None:
+                    break
+
+                try:
+                    await self.repository.bulk_write(write.ops)
+                except Exception as e:
+                    log.error(f"Failed to flush XP ({len(write.ops)} users): {e}")
+                    write.on_failure(failed_ops(e))
+                    break
+
+                write.on_success()
+                written += len(write.ops)
+            return written
+
+def _total_xp(user: dict) -> int:
+    """XP за всі рівні разом: сума порогів пройдених рівнів + поточний xp"""
+    return sum(get_level_xp(level) for level in range(1, user.get("level", 1))) + user.get("xp", 0)
+
+def merge_users(kept: dict, duplicates: list) -> dict:
+    """Один документ з кількох документів того ж (guild_id, user_id): лічильники і XP сумуються"""
+    merged = dict(kept)
+    total = _total_xp(kept)
+    hist = dict(kept.get("hist") or {})
+    legacy = dict(kept.get("history") or {})
+    flushes = list(kept.get("flushes") or [])
+    merged_from = list(kept.get("merged_from") or [])
+    for user in duplicates:
+        total += _total_xp(user)
+        for field in ("messages", "reactions", "voice_minutes"):
+            merged[field] = merged.get(field, 0) + user.get(field, 0)
+        for slot, entry in (user.get("hist") or {}).items():
+            current = hist.get(slot)
+            if current is None or current.get("d", 0) < entry.get("d", 0):
+                hist[slot] = entry
+            elif current.get("d") == entry.get("d"):
+                hist[slot] = {"d": current["d"], "xp": current.get("xp", 0) + entry.get("xp", 0)}
+        for day, value in (user.get("history") or {}).items():
+            legacy[day] = legacy.get(day, 0) + value
+        flushes.extend(token for token in user.get("flushes") or () if token not in flushes)
+        merged_from.append(user["_id"])
+        # Решта полів (ім'я, аватар, профіль) - з основного документа, відсутні - з дубліката
+        for field, value in user.items():
+            merged.setdefault(field, value)
+
+    level = 1
+    while total >= get_level_xp(level):
+        total -= get_level_xp(level)
+        level += 1
+    merged.update(xp=total, level=level, score=total + level * LEVEL_SCORE, merged_from=merged_from)
+    if hist:
+        merged["hist"] = hist
+    if legacy:
+        merged["history"] = legacy
+    if flushes:
+        merged["flushes"] = flushes[-FLUSH_TOKENS:]
+    return merged
+
+async def merge_duplicate_users(collection, migrations):
+    """Злити дублікати користувачів, які лишила гонка find-then-insert, перед створенням унікального індексу.
+    Основний документ запам'ятовує злиті _id у merged_from, тому перерваний запуск безпечно продовжується"""
+    state = await migrations.find_one({"_id": "users_unique"}) or {}
+    if state.get("done"):
+        return 0
+
+    merged = 0
+    groups = collection.aggregate([
+        {"$group": {"_id": {"guild_id": "$guild_id", "user_id": "$user_id"}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in groups:
+        users = await collection.find({"_id": {"$in": group["ids"]}}).sort("_id", 1).to_list(None)
+        if len(users) < 2:
+            continue
+        kept, rest = users[0], users[1:]
+        done = set(kept.get("merged_from") or ())
+        fresh = [user for user in rest if user["_id"] not in done]
+        if fresh:
+            await collection.replace_one({"_id": kept["_id"]}, merge_users(kept, fresh))
+        await collection.delete_many({"_id": {"$in": [user["_id"] for user in rest]}})
+        merged += len(rest)
+
+    await collection.update_many({"merged_from": {"$exists": True}}, {"$unset": {"merged_from": ""}})
+    await migrations.update_one({"_id": "users_unique"}, {"$set": {"done": True}}, upsert=True)
+    if merged:
+        log.info(f"Duplicate users merged: {merged} documents removed")
+    return merged
+
+async def ensure_unique_users(collection) -> bool:
+    """Замінити старий неунікальний індекс (guild_id, user_id) унікальним; False, якщо не вдалося"""
+    for name, info in (await collection.index_information()).items():
+        if [(field, int(direction)) for field, direction in info["key"]] == USER_KEY and not info.get("unique"):
+            await collection.drop_index(name)
+            log.info(f"Dropped non-unique users index {name}")
+    try:
+        await collection.create_index(USER_KEY, unique=True)
+    except Exception as e:
+        log.error(f"Failed to create unique users index (guild_id, user_id): {e}")
+        return False
+    return True
+
+async def migrate_history(collection, migrations, batch_size: int = 500):
+    """Перенести старий словник history у кільцевий буфер hist (з можливістю продовження)"""
+    state = await migrations.find_one({"_id": "history_ring"}) or {}
+    if state.get("done"):
+        return 0
+
+    last_id = state.get("last_id")
+    migrated = 0
+    while True:
+        query = {"history": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        users = await collection.find(query, {"history": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not users:
+            break
+
+        oldest = history_ordinal() - HISTORY_DAYS
+        ops = []
+        for user in users:
+            fields = {}
+            for day, value in (user.get("history") or {}).items():
+                try:
+                    ordinal = date.fromisoformat(day).toordinal()
+                except (TypeError, ValueError):
+                    continue
+                if ordinal > oldest and value:
+                    slot, expression = _history_slot(ordinal, value)
+                    fields[slot] = expression
+
+            pipeline = [{"$set": fields}] if fields else []
+            pipeline.append({"$unset": "history"})
+            # Фільтр по history робить повторний запуск безпечним
+            ops.append(UpdateOne({"_id": user["_id"], "history": {"$exists": True}}, pipeline))
+
+        await collection.bulk_write(ops, ordered=False)
+        migrated += len(users)
+        last_id = users[-1]["_id"]
+        await migrations.update_one({"_id": "history_ring"}, {"$set": {"last_id": last_id}}, upsert=True)
+        # Фонова задача - не займаємо цикл подій надовго
+        await asyncio.sleep(0.5)
+
+    await migrations.update_one({"_id": "history_ring"}, {"$set": {"done": True}}, upsert=True)
+    log.info(f"History migration finished: {migrated} users converted")
+    return migrated
+
+async def backfill_scores(collection):
+    """Заповнити score для документів, створених до його появи"""
+    result = await collection.update_many({"score": {"$exists": False}}, [{"$set": {"score": SCORE_EXPRESSION}}])
+    if result.modified_count:
+        log.info(f"Score backfilled for {result.modified_count} users")
+    return result.modified_count
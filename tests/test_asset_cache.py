@@ -0,0 +1,171 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from modules.asset_cache import AssetCache, asset_key
+from modules.http import close_session
+
+@asynccontextmanager
+async def cdn(size: int = 100):
+    """Локальна заміна CDN Discord: рахує запити, може затримати відповідь або віддати 500"""
+    state = {"requests": [], "fail": set(), "gate": None}
+
+    async def avatar(request):
+        name = request.match_info["name"]
+        state["requests"].append(name)
+        if state["gate"] is not None:
+            await state["gate"].wait()
+        if name in state["fail"]:
+            state["fail"].discard(name)
+            return web.Response(status=500)
+        return web.Response(body=name.encode().ljust(size, b"\0"), content_type="image/png")
+
+    app = web.Application()
+    app.router.add_get("/avatars/{user}/{name}.png", avatar)
+    server = TestServer(app)
+    await server.start_server()
+
+    def url(name):
+        return f"http://{server.host}:{server.port}/avatars/1/{name}.png?size=64"
+
+    try:
+        yield url, state
+    finally:
+        await close_session()
+        await server.close()
+
+def test_miss_fetches_and_stores_on_disk(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            cache = AssetCache(directory=str(tmp_path))
+            return url, state, cache, await cache.get(url("a"))
+
+    url, state, cache, data = asyncio.run(main())
+
+    assert data == b"a".ljust(100, b"\0")
+    assert state["requests"] == ["a"]
+    assert cache.misses == 1
+    assert (tmp_path / asset_key(url("a"))).read_bytes() == data
+
+def test_memory_hit_skips_fetch(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            cache = AssetCache(directory=str(tmp_path))
+            first = await cache.get(url("a"))
+            second = await cache.get(url("a"))
+            return state, cache, first, second
+
+    state, cache, first, second = asyncio.run(main())
+
+    assert first == second
+    assert state["requests"] == ["a"]
+    assert cache.memory_hits == 1
+
+def test_disk_hit_after_restart(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            await AssetCache(directory=str(tmp_path)).get(url("a"))
+            cache = AssetCache(directory=str(tmp_path))
+            return state, cache, await cache.get(url("a"))
+
+    state, cache, data = asyncio.run(main())
+
+    assert data is not None
+    assert state["requests"] == ["a"]
+    assert cache.disk_hits == 1
+
+def test_concurrent_requests_share_one_fetch(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            cache = AssetCache(directory=str(tmp_path))
+            state["gate"] = asyncio.Event()
+            tasks = [asyncio.create_task(cache.get(url("a"))) for _ in range(5)]
+            await asyncio.sleep(0.1)
+            state["gate"].set()
+            return state, cache, await asyncio.gather(*tasks)
+
+    state, cache, results = asyncio.run(main())
+
+    assert state["requests"] == ["a"]
+    assert cache.coalesced == 4
+    assert len(set(results)) == 1 and results[0] is not None
+
+def test_disk_lru_evicts_least_recently_used_by_size(tmp_path):
+    async def main():
+        async with cdn(size=100) as (url, state):
+            # Без гарячого рівня кожен повторний запит іде на диск і оновлює порядок LRU
+            cache = AssetCache(directory=str(tmp_path), max_disk_bytes=250, max_memory_bytes=0)
+            for name in ("a", "b", "a", "c"):
+                await cache.get(url(name))
+            return url, cache
+
+    url, cache = asyncio.run(main())
+
+    assert cache.disk_hits == 1
+    assert sorted(os.listdir(tmp_path)) == sorted([asset_key(url("a")), asset_key(url("c"))])
+    assert cache._disk_bytes == 200
+
+def test_memory_lru_evicts_by_size(tmp_path):
+    async def main():
+        async with cdn(size=100) as (url, state):
+            cache = AssetCache(directory=str(tmp_path), max_memory_bytes=250)
+            for name in ("a", "b", "a", "c"):
+                await cache.get(url(name))
+            return url, cache
+
+    url, cache = asyncio.run(main())
+
+    assert list(cache._memory) == [asset_key(url("a")), asset_key(url("c"))]
+    assert cache._memory_bytes == 200
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            cache = AssetCache(directory=str(tmp_path))
+            state["fail"].add("a")
+            first = await cache.get(url("a"))
+            second = await cache.get(url("a"))
+            return url, state, cache, first, second
+
+    url, state, cache, first, second = asyncio.run(main())
+
+    assert first is None and second is not None
+    assert state["requests"] == ["a", "a"]
+    assert cache.failures == 1
+    assert not cache._inflight
+    assert os.listdir(tmp_path) == [asset_key(url("a"))]
+
+def test_unreachable_cdn_is_not_cached(tmp_path):
+    async def main():
+        async with cdn() as (url, state):
+            dead_url = url("a")
+        cache = AssetCache(directory=str(tmp_path))
+        try:
+            return cache, await cache.get(dead_url)
+        finally:
+            await close_session()
+
+    cache, data = asyncio.run(main())
+
+    assert data is None
+    assert cache.failures == 1
+    assert os.listdir(tmp_path) == []
+
+def test_parallel_disk_writes_keep_size_accounting(tmp_path):
+    async def main():
+        async with cdn(size=100) as (url, state):
+            cache = AssetCache(directory=str(tmp_path), max_disk_bytes=450, max_memory_bytes=0)
+            await cache.get_many([url(str(number)) for number in range(20)])
+            return cache
+
+    cache = asyncio.run(main())
+
+    files = [name for name in os.listdir(tmp_path) if not name.endswith(".tmp")]
+    assert cache._disk_bytes == sum(os.path.getsize(tmp_path / name) for name in files)
+    assert sorted(files) == sorted(cache._disk)
+    assert cache._disk_bytes <= 450
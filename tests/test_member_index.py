@@ -0,0 +1,53 @@
+import asyncio
+import pytest
+
+pytest.importorskip("discord")
+
+from modules.member_index import GuildNameIndex, MemberIndex
+
+class FakeMember:
+    def __init__(self, member_id, name, display_name=None):
+        self.id = member_id
+        self.name = name
+        self.display_name = display_name or name
+        self.global_name = None
+
+class FakeGuild:
+    def __init__(self, members):
+        self.id = 1
+        self.members = members
+
+    def get_member(self, member_id):
+        return next((member for member in self.members if member.id == member_id), None)
+
+MEMBERS = [FakeMember(1, "alice"), FakeMember(2, "alina", "Ali"), FakeMember(3, "bob")]
+
+def test_bulk_build_matches_incremental_index():
+    incremental = GuildNameIndex()
+    for member in MEMBERS:
+        incremental.add(member)
+
+    bulk = GuildNameIndex.from_members(MEMBERS)
+
+    assert bulk._entries == incremental._entries
+    assert len(bulk) == len(MEMBERS)
+
+@pytest.mark.parametrize("text", ["", "   ", "\t\n"])
+def test_blank_input_is_not_found(text):
+    index = MemberIndex()
+    guild = FakeGuild(MEMBERS)
+
+    assert asyncio.run(index.resolve(guild, text)) == (None, [])
+
+def test_prefix_resolves_only_without_exact():
+    index = MemberIndex()
+    guild = FakeGuild(MEMBERS)
+
+    member, candidates = asyncio.run(index.resolve(guild, "bo"))
+    assert member is MEMBERS[2] and candidates == []
+
+    member, candidates = asyncio.run(index.resolve(guild, "bo", exact=True))
+    assert member is None and candidates == [MEMBERS[2]]
+
+    member, candidates = asyncio.run(index.resolve(guild, "BOB", exact=True))
+    assert member is MEMBERS[2] and candidates == []
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+
+pytest.importorskip("pymongo")
+
+from pymongo.errors import BulkWriteError
+from modules.pipeline import EventPipeline, PendingWrite
+
+class FakeRepository:
+    collection_name = "users"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.writes = []
+
+    async def bulk_write(self, ops):
+        self.writes.append(ops)
+        if self.error:
+            raise self.error
+
+def test_failing_callback_does_not_skip_other_sinks():
+    repository = FakeRepository()
+    pipeline = EventPipeline()
+    calls = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    pipeline.register_sink("first", lambda: PendingWrite(repository, ["a"], on_success=broken))
+    pipeline.register_sink("second", lambda: PendingWrite(repository, ["b"], on_success=lambda: calls.append("second")))
+
+    assert asyncio.run(pipeline.flush()) == 2
+    assert calls == ["second"]
+    assert repository.writes == [["a", "b"]]
+
+def test_bulk_write_errors_are_split_per_sink():
+    error = BulkWriteError({"writeErrors": [{"index": 2, "code": 11000}], "writeConcernErrors": []})
+    repository = FakeRepository(error)
+    pipeline = EventPipeline()
+    results = {}
+
+    pipeline.register_sink("first", lambda: PendingWrite(
+        repository, ["a", "b"], on_success=lambda: results.setdefault("first", "ok"),
+        on_failure=lambda failed: results.setdefault("first", failed)))
+    pipeline.register_sink("second", lambda: PendingWrite(
+        repository, ["c", "d"], on_success=lambda: results.setdefault("second", "ok"),
+        on_failure=lambda failed: results.setdefault("second", failed)))
+
+    assert asyncio.run(pipeline.flush()) == 3
+    assert results == {"first": "ok", "second": {0: 11000}}
+
+def test_unknown_failure_reports_none():
+    repository = FakeRepository(TimeoutError())
+    pipeline = EventPipeline()
+    results = []
+    pipeline.register_sink("xp", lambda: PendingWrite(repository, ["a"], on_failure=results.append))
+
+    assert asyncio.run(pipeline.flush()) == 0
+    assert results == [None]
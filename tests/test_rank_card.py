@@ -0,0 +1,13 @@
+import pytest
+
+pytest.importorskip("PIL")
+
+from modules.rank_card import RankCardRenderer
+
+HISTORY = [120, 40, 0, 310, 95, 60, 200, 10, 0, 75, 130, 90, 20, 300]
+
+@pytest.mark.parametrize("avatar", [None, b"", b"<html>502 Bad Gateway</html>", b"\x89PNG\r\n\x1a\n broken"])
+def test_render_falls_back_to_placeholder_for_bad_avatar(avatar):
+    image = RankCardRenderer().render("User", 5, 120, 400, HISTORY, avatar)
+
+    assert image.startswith(b"\x89PNG")
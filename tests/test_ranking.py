@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+
+pytest.importorskip("pymongo")
+
+from modules.ranking import RankingIndex
+
+class FakeCursor:
+    def __init__(self, documents, between=None):
+        self.documents = documents
+        self.between = between
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for position, document in enumerate(self.documents):
+            if self.between:
+                self.between(position)
+            await asyncio.sleep(0)
+            yield dict(document)
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.between = None
+
+    def find(self, query, projection=None):
+        documents = [
+            document for document in self.documents
+            if all(document.get(field) == value or (isinstance(value, dict) and document.get(field) in value.get("$in", ()))
+                   for field, value in query.items())
+        ]
+        return FakeCursor(documents, self.between)
+
+class FakeRepository:
+    def __init__(self, documents):
+        self.collection = FakeCollection(documents)
+
+def _user(user_id, xp, flushes=()):
+    return {"guild_id": 1, "user_id": user_id, "xp": xp, "level": 1, "messages": 0, "voice_minutes": 0,
+            "reactions": 0, "flushes": list(flushes)}
+
+def _delta(xp, token):
+    return {"xp": xp, "messages": 0, "reactions": 0, "voice_minutes": 0, "token": token}
+
+def test_deltas_during_load_are_not_lost_or_doubled():
+    index = RankingIndex()
+    documents = [_user(1, 10), _user(2, 10)]
+    repository = FakeRepository(documents)
+
+    def flush_while_reading(position):
+        if position == 1:
+            # Запис, що завершився посеред читання: користувач 1 уже прочитаний, користувач 2 - ні
+            documents[0].update(xp=15, flushes=["a"])
+            documents[1].update(xp=15, flushes=["a"])
+            index.apply_deltas([((1, 1), _delta(5, "a")), ((1, 2), _delta(5, "a"))])
+
+    repository.collection.between = flush_while_reading
+    asyncio.run(index.load(repository))
+
+    ranking = index.get(1)
+    assert ranking.get(1)["xp"] == 15
+    assert ranking.get(2)["xp"] == 15
+
+def test_delta_for_new_user_during_load_is_replayed():
+    index = RankingIndex()
+    repository = FakeRepository([_user(1, 10)])
+    repository.collection.between = lambda position: index.apply_deltas([((1, 3), _delta(7, "b"))])
+
+    asyncio.run(index.load(repository))
+
+    assert index.get(1).get(3)["xp"] == 7
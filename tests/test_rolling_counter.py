@@ -0,0 +1,34 @@
+from modules.rolling_counter import RollingCounter, RollingCounters, MINUTES_24H, _now_minute
+
+NAMES = ("messages", "mod_actions")
+
+def test_seed_continues_stored_totals_and_expires_them():
+    now = 1_000_000
+    counter = RollingCounter(now)
+    counter.seed(1440, 168 * 10, now, now)
+    assert counter.totals(now) == (1440, 1680)
+
+    # Через 12 годин половина 24-годинного вікна випала
+    assert counter.totals(now + 720)[0] == 720
+    assert counter.totals(now + MINUTES_24H)[0] == 0
+
+def test_seed_drops_part_of_window_that_expired_while_offline():
+    now = 1_000_000
+    counter = RollingCounter(now)
+    counter.seed(1000, 0, now - 720, now)
+
+    assert counter.totals(now)[0] == 500
+
+def test_unchanged_guilds_are_not_rewritten():
+    counters = RollingCounters(NAMES)
+    counters.seed(1, {"messages_24h": 10, "messages_7d": 10}, _now_minute())
+    counters.track(2)
+
+    # Засіяний сервер уже має ці підсумки в БД, новий - отримує нулі один раз
+    first = counters.snapshot()
+    assert list(first) == [2]
+    counters.mark_written(first)
+    assert counters.snapshot() == {}
+
+    counters.add(1, "messages")
+    assert counters.snapshot() == {1: {"messages_24h": 11, "messages_7d": 11, "mod_actions_24h": 0, "mod_actions_7d": 0}}
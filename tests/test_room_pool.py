@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+
+pytest.importorskip("discord")
+
+from modules import room_pool as room_pool_module
+from modules.room_pool import RoomPool
+
+class FakeChannel:
+    def __init__(self, channel_id, name):
+        self.id = channel_id
+        self.name = name
+        self.members = []
+        self.guild = None
+
+    async def delete(self):
+        del self.guild.channels[self.id]
+
+class FakeGuild:
+    def __init__(self):
+        self.id = 1
+        self.default_role = "everyone"
+        self.me = "bot"
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+class FakeCategory:
+    def __init__(self, guild):
+        self.guild = guild
+        self.created = []
+
+    @property
+    def voice_channels(self):
+        return list(self.guild.channels.values())
+
+    async def create_voice_channel(self, name, overwrites):
+        await asyncio.sleep(0)
+        channel = FakeChannel(1000 + len(self.created), name)
+        channel.guild = self.guild
+        self.guild.channels[channel.id] = channel
+        self.created.append(channel.id)
+        return channel
+
+def test_refill_interleaved_with_acquire_keeps_every_spare(monkeypatch):
+    monkeypatch.setattr(room_pool_module, "REFILL_DELAY", 0)
+    pool = RoomPool(size=3)
+    guild = FakeGuild()
+    category = FakeCategory(guild)
+    acquired = []
+
+    async def take_rooms():
+        for _ in range(20):
+            channel = pool.acquire(guild)
+            if channel is not None:
+                # Зайнята кімната більше не запасна
+                channel.members.append("user")
+                acquired.append(channel.id)
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(pool.refill(guild, category), take_rooms())
+        await pool.refill(guild, category)
+
+    asyncio.run(main())
+
+    assert acquired
+    spares = pool._spares[guild.id]
+    # Кожен створений канал або видали користувачу, або він лишився в пулі
+    assert sorted(spares + acquired) == sorted(category.created)
+    assert len(spares) == 3
+
+def test_concurrent_refills_do_not_overfill(monkeypatch):
+    monkeypatch.setattr(room_pool_module, "REFILL_DELAY", 0)
+    pool = RoomPool(size=2)
+    guild = FakeGuild()
+    category = FakeCategory(guild)
+
+    async def main():
+        await asyncio.gather(pool.refill(guild, category), pool.refill(guild, category))
+
+    asyncio.run(main())
+
+    assert len(category.created) == 2
+    assert pool.stats()["spares"] == 2
+
+def _leftover_spares(guild, count):
+    for channel_id in range(1, count + 1):
+        channel = guild.channels[channel_id] = FakeChannel(channel_id, "spare-room")
+        channel.guild = guild
+
+def test_leftover_spares_adopted_after_early_acquire(monkeypatch):
+    monkeypatch.setattr(room_pool_module, "REFILL_DELAY", 0)
+    pool = RoomPool(size=2)
+    guild = FakeGuild()
+    category = FakeCategory(guild)
+    _leftover_spares(guild, 2)
+
+    # Хтось зайшов у канал-створювач до першого refill
+    assert pool.acquire(guild) is None
+    asyncio.run(pool.refill(guild, category))
+
+    assert category.created == []
+    assert sorted(pool._spares[guild.id]) == [1, 2]
+
+def test_refill_trims_spares_above_size(monkeypatch):
+    monkeypatch.setattr(room_pool_module, "REFILL_DELAY", 0)
+    pool = RoomPool(size=1)
+    guild = FakeGuild()
+    category = FakeCategory(guild)
+    _leftover_spares(guild, 3)
+
+    asyncio.run(pool.refill(guild, category))
+
+    assert len(pool._spares[guild.id]) == 1
+    assert list(guild.channels) == pool._spares[guild.id]
+
+def test_released_spare_is_reused():
+    pool = RoomPool(size=1)
+    guild = FakeGuild()
+    _leftover_spares(guild, 1)
+    pool._spares[guild.id] = [1]
+
+    channel = pool.acquire(guild)
+    pool.release(guild, channel)
+
+    assert pool.acquire(guild) is channel
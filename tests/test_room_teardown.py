@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("motor")
+
+from modules import room_teardown as room_teardown_module
+from modules.room_teardown import reconcile_rooms
+
+class FakeChannel:
+    def __init__(self, guild, channel_id, gate=None):
+        self.guild = guild
+        self.id = channel_id
+        self.members = []
+        self.gate = gate
+        self.deleted = False
+
+    async def delete(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        self.deleted = True
+
+class FakeGuild:
+    def __init__(self):
+        self.id = 1
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+class FakeRooms:
+    def __init__(self, rooms):
+        self.rooms = rooms
+
+    async def iter_active(self, guild_id):
+        for room in self.rooms:
+            yield room
+
+class FakeRegistry:
+    def __init__(self):
+        self.deactivated = []
+
+    async def deactivate_many(self, rooms, deleted_at):
+        self.deactivated.extend(rooms)
+
+def test_room_rejoined_while_waiting_is_not_deleted(monkeypatch):
+    guild = FakeGuild()
+    registry = FakeRegistry()
+    monkeypatch.setattr(room_teardown_module, "DELETE_DELAY", 0)
+    monkeypatch.setattr(room_teardown_module, "voice_rooms", registry)
+    rooms = [{"_id": 1, "channel_id": 10}, {"_id": 2, "channel_id": 20}]
+    monkeypatch.setattr(room_teardown_module, "private_rooms", FakeRooms(rooms))
+
+    async def main():
+        gate = asyncio.Event()
+        first = guild.channels[10] = FakeChannel(guild, 10, gate)
+        second = guild.channels[20] = FakeChannel(guild, 20)
+        task = asyncio.create_task(reconcile_rooms([guild], concurrency=1))
+        await asyncio.sleep(0.01)
+        # Власник повернувся в другу кімнату, поки перша ще видаляється
+        second.members.append("owner")
+        gate.set()
+        return await task, first, second
+
+    report, first, second = asyncio.run(main())
+
+    assert first.deleted and not second.deleted
+    assert report["deleted_channels"] == 1 and report["in_use"] == 1
+    assert [room["_id"] for room in registry.deactivated] == [1]
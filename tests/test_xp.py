@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("pymongo")
+
+from modules.xp import XPAccumulator, merge_users, get_level_xp, roll_levels, LEVEL_SCORE
+
+class FakeMember:
+    def __init__(self, member_id):
+        self.id = member_id
+        self.display_name = "user"
+        self.display_avatar = None
+
+def test_merge_users_sums_activity_across_levels():
+    kept = {"_id": 1, "guild_id": 1, "user_id": 2, "xp": 10, "level": 2, "messages": 5, "username": "kept",
+            "hist": {"3": {"d": 33, "xp": 10}}, "flushes": ["a"]}
+    duplicate = {"_id": 2, "guild_id": 1, "user_id": 2, "xp": get_level_xp(1) - 1, "level": 1, "messages": 3,
+                 "reactions": 1, "username": "dup", "bio": "hi", "hist": {"3": {"d": 33, "xp": 5}}, "flushes": ["b"]}
+
+    merged = merge_users(kept, [duplicate])
+
+    expected_xp, expected_level = roll_levels(get_level_xp(1) + 10 + get_level_xp(1) - 1, 1)
+    assert (merged["xp"], merged["level"]) == (expected_xp, expected_level)
+    assert merged["score"] == expected_xp + expected_level * LEVEL_SCORE
+    assert merged["messages"] == 8 and merged["reactions"] == 1
+    assert merged["hist"]["3"] == {"d": 33, "xp": 15}
+    assert merged["username"] == "kept" and merged["bio"] == "hi"
+    assert merged["flushes"] == ["a", "b"]
+    assert merged["merged_from"] == [2]
+
+@pytest.mark.parametrize("retry_upsert", [True, False])
+def test_retry_upserts_only_with_unique_index(retry_upsert):
+    accumulator = XPAccumulator(repository=None, retry_upsert=retry_upsert)
+    accumulator.add(1, FakeMember(2), xp=10)
+
+    write = accumulator.collect()
+    assert write.ops[0]._upsert
+    write.on_failure(None)
+
+    retry = accumulator.collect()
+    assert retry.ops[0]._upsert is retry_upsert
+    assert retry.ops[0]._filter["flushes"] == write.ops[0]._filter["flushes"]